@@ -1,9 +1,13 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from .database import Base, engine
+from .database import engine, read_engine, run_maintenance
 from .security import limiter
+from .middleware import AuthMiddleware, RateLimitMiddleware
 from .routes.auth import router as auth_router
 from .routes.accounts import router as accounts_router
 from .routes.transfers import router as transfers_router
@@ -12,10 +16,34 @@ from .routes.cards import router as cards_router
 from .routes.statements import router as statements_router
 
 
-# create database tables ---- remove!!!!!
-# Base.metadata.create_all(bind=engine)
+DB_MAINTENANCE_INTERVAL = 3600
+
+
+async def _db_maintenance():
+    while True:
+        await asyncio.sleep(DB_MAINTENANCE_INTERVAL)
+        try:
+            await run_in_threadpool(run_maintenance)
+        # database busy -> skip this round, try again next interval
+        except OperationalError:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # a worker forked after import (gunicorn --preload) must not reuse the parent's sqlite handles
+    # close=False -> drop the inherited pool without closing connections the parent still owns
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    maintenance = asyncio.create_task(_db_maintenance())
+    yield
+    maintenance.cancel()
+    engine.dispose()
+    read_engine.dispose()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Banking REST API",
     description="A comprehensive banking API with accounts, transfers, cards, and admin features",
     version="2.0.0"
@@ -23,9 +51,13 @@ app = FastAPI(
 
 
 # Configure rate limiting with fastapi
+# pure ASGI middleware -> avoids BaseHTTPMiddleware's per-request task + response buffering
+# limits are checked before routing -> rejected requests never reach body parsing or dependencies
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+app.add_middleware(RateLimitMiddleware)
+# added last -> runs first, so the limiter's key_func can see request.state.user
+app.add_middleware(AuthMiddleware)
 
 # include routes
 app.include_router(auth_router)
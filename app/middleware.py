@@ -0,0 +1,89 @@
+"""
+ASGI middleware for the banking application.
+"""
+
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from starlette.requests import Request
+from starlette.routing import Match
+
+from .security import decode_access_token
+
+
+class AuthMiddleware:
+    """
+    Decode the bearer token once per request and stash the AuthUser in scope state.
+
+    Pure ASGI (no BaseHTTPMiddleware) -> no extra task or body buffering. Requests
+    without a valid token pass through untouched; get_current_user rejects them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    if scheme.lower() == "bearer" and token:
+                        user = decode_access_token(token)
+                        if user is not None:
+                            scope.setdefault("state", {})["user"] = user
+                    break
+
+        await self.app(scope, receive, send)
+
+
+def _flatten_routes(routes):
+    """Leaf routes of the app -> newer FastAPI keeps included routers nested instead of copying their routes."""
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            yield from _flatten_routes(included.routes)
+        else:
+            yield route
+
+
+def _find_endpoint(routes, scope):
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "endpoint", None)
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Check the app-wide and per-route limits before the request is routed.
+
+    slowapi's own middleware leaves decorated routes to the decorator, which only runs
+    after body parsing and dependencies -> a flood of rejected requests was never counted.
+    Checking here also marks the request done, so the decorator doesn't count it twice.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.routes = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            app = scope["app"]
+            limiter = app.state.limiter
+            # routes are fixed once the app serves requests -> flatten them on the first one
+            if self.routes is None:
+                self.routes = list(_flatten_routes(app.routes))
+            handler = _find_endpoint(self.routes, scope)
+            if limiter.enabled and handler is not None:
+                request = Request(scope, receive=receive)
+                try:
+                    # in_middleware=True -> application (and default) limits, False -> the route's decorator limits
+                    limiter._check_request_limit(request, handler, in_middleware=True)
+                    limiter._check_request_limit(request, handler, in_middleware=False)
+                except RateLimitExceeded as exc:
+                    handle = app.exception_handlers.get(RateLimitExceeded, _rate_limit_exceeded_handler)
+                    await handle(request, exc)(scope, receive, send)
+                    return
+                request.state._rate_limiting_complete = True
+
+        await self.app(scope, receive, send)
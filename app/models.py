@@ -1,16 +1,54 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, Enum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Index, Integer, BINARY
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
 import enum
+import os
+import time
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
 """
 Database models for the banking application.
 """
 
 
+# =================================================================
+# Column types
+# =================================================================
+class GUID(TypeDecorator):
+    """UUID stored as BINARY(16) on SQLite (vs 32-char text) and native UUID on PostgreSQL."""
+    impl = BINARY
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(bytes=value)
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 v7): 48-bit ms timestamp, then 74 random bits."""
+    value = ((time.time_ns() // 1_000_000) << 80) | int.from_bytes(os.urandom(10), "big")
+    # stamp version 7 and the RFC variant over the random bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
 # =================================================================
 # Enums - enforce specificicity
 # =================================================================
@@ -62,73 +100,113 @@ class CardStatus(enum.Enum):
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     # user, admin
     role = Column(Enum(RoleType), default=RoleType.USER)
+    # embedded in access tokens -> bump to revoke them (e.g. on role change)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     accounts = relationship("Account", back_populates="owner")
 
 
 class Account(Base):
     __tablename__ = "accounts"
+    # every list route filters or joins accounts by owner -> index instead of a table scan;
+    # id rides along so "ids of this user's accounts" subqueries never touch the table
+    __table_args__ = (
+        Index("ix_accounts_user_id_id", "user_id", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4, index=True)
+    user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
     type = Column(Enum(AccountType), nullable=False)
-    balance = Column(Numeric(precision=10, scale=2), default=0.0, nullable=False)
+    # money is stored as integer cents -> exact arithmetic, no Decimal per row
+    balance_cents = Column(Integer, default=0, nullable=False)
     status = Column(Enum(AccountStatus), default=AccountStatus.ACTIVE, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     owner = relationship("User", back_populates="accounts")
-    transactions = relationship("Transaction", back_populates="account", cascade="all, delete-orphan")
+    # history is always fetched with an explicit, paginated query -> never lazy-load the collection
+    transactions = relationship("Transaction", back_populates="account", cascade="all, delete-orphan", lazy="raise_on_sql")
     cards = relationship("Card", back_populates="account", cascade="all, delete-orphan")
 
+    @property
+    def balance(self) -> float:
+        return self.balance_cents / 100
+
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    # per-account history newest-first -> SQLite walks the index backwards instead of sorting
+    # id is the tie-breaker of the keyset cursor -> (created_at, id) seeks stay inside the index
+    # same shape per owner -> the user-wide history needs no join through accounts
+    __table_args__ = (
+        Index("ix_tx_account_created_id", "account_id", "created_at", "id"),
+        Index("ix_tx_user_created_id", "user_id", "created_at", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
+    # append-heavy tables get time-ordered ids -> inserts land on the right edge of the pk index
+    id = Column(GUID(), primary_key=True, default=uuid7, index=True)
+    account_id = Column(GUID(), ForeignKey("accounts.id"), nullable=False)
+    # denormalized accounts.user_id (accounts never change owner) -> set on insert, never updated
+    user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
     type = Column(Enum(TransactionDirection), nullable=False)
-    amount = Column(Numeric(precision=10, scale=2), nullable=False)
+    amount_cents = Column(Integer, nullable=False)
     description = Column(String, nullable=True)
     reference = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # transfer category and link
     category = Column(Enum(TransactionCategory), nullable=False, default=TransactionCategory.TRANSFER)
-    card_id = Column(UUID(as_uuid=True), ForeignKey("cards.id"), nullable=True)
+    card_id = Column(GUID(), ForeignKey("cards.id"), nullable=True)
+    # deferred -> transactions are written before the transfer row that links them
     transfer_id = Column(
-        UUID(as_uuid=True),
-        ForeignKey("transfers.id", name="fk_transaction_transfer", use_alter=True),
+        GUID(),
+        ForeignKey(
+            "transfers.id",
+            name="fk_transaction_transfer",
+            use_alter=True,
+            deferrable=True,
+            initially="DEFERRED"
+        ),
         nullable=True
     )
-    account = relationship("Account", back_populates="transactions")
-    transfer = relationship("Transfer", foreign_keys=[transfer_id])
-    card = relationship("Card", foreign_keys=[card_id])
+    # TransactionOut only reads the FK columns -> a lazy load here is an N+1 during serialization
+    account = relationship("Account", back_populates="transactions", lazy="raise_on_sql")
+    transfer = relationship("Transfer", foreign_keys=[transfer_id], lazy="raise_on_sql")
+    card = relationship("Card", foreign_keys=[card_id], lazy="raise_on_sql")
+
+    @property
+    def amount(self) -> float:
+        return self.amount_cents / 100
 
 
 class Transfer(Base):
     __tablename__ = "transfers"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    source_account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
-    destination_account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
-    amount = Column(Numeric(precision=10, scale=2), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid7)
+    # get_transfers looks up sent and received transfers separately -> one index per side
+    source_account_id = Column(GUID(), ForeignKey("accounts.id"), nullable=False, index=True)
+    destination_account_id = Column(GUID(), ForeignKey("accounts.id"), nullable=False, index=True)
+    amount_cents = Column(Integer, nullable=False)
     description = Column(String, nullable=True)
-    source_transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
-    destination_transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"), nullable=False)
+    source_transaction_id = Column(GUID(), ForeignKey("transactions.id"), nullable=False)
+    destination_transaction_id = Column(GUID(), ForeignKey("transactions.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    @property
+    def amount(self) -> float:
+        return self.amount_cents / 100
+
 
 class Card(Base):
     __tablename__ = "cards"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    account_id = Column(UUID(as_uuid=True), ForeignKey("accounts.id"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4, index=True)
+    account_id = Column(GUID(), ForeignKey("accounts.id"), nullable=False)
     card_number = Column(String, unique=True, nullable=False)
     card_holder_name = Column(String, nullable=False)
     # NO CVV - generated, not stored for compliance
@@ -136,8 +214,13 @@ class Card(Base):
     card_type = Column(Enum(CardType), nullable=False)
     expiry_date = Column(DateTime, nullable=False)
     status = Column(Enum(CardStatus), default=CardStatus.ACTIVE, nullable=False)
-    spending_limit = Column(Numeric(precision=10, scale=2), nullable=True)
+    spending_limit_cents = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    account = relationship("Account", back_populates="cards")
+    # card routes filter through an explicit join and CardOut never reads it -> never lazy-load
+    account = relationship("Account", back_populates="cards", lazy="raise_on_sql")
     transactions = relationship("Transaction", back_populates="card", foreign_keys="Transaction.card_id")
+
+    @property
+    def spending_limit(self):
+        return None if self.spending_limit_cents is None else self.spending_limit_cents / 100
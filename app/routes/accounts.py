@@ -1,25 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+import orjson
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from ..database import get_db
-from ..models import Account, User, AccountType, AccountStatus, Transaction
+from ..database import get_db, get_db_ro
+from ..models import Account, AccountType, AccountStatus, Transaction
 from ..schemas import AccountCreate, AccountOut, TransactionOut
-from ..security import get_current_user
+from ..security import get_current_user, AuthUser
 from ..security import limiter
 
 # accounts routes
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
+# statements built once at import -> reused (and cache-hit) on every request
+_ACCOUNTS_BY_USER = select(Account).where(Account.user_id == bindparam("uid"))
+_ACCOUNT_BY_ID = select(Account).where(
+    Account.id == bindparam("aid"),
+    Account.user_id == bindparam("uid")
+)
+# plain columns, not entities -> rows skip ORM identity map / instance state hydration
+_TX_ROWS_BY_ACCOUNT = select(
+    Transaction.id,
+    Transaction.account_id,
+    Transaction.type,
+    Transaction.amount_cents,
+    Transaction.description,
+    Transaction.reference,
+    Transaction.created_at,
+    Transaction.category,
+    Transaction.transfer_id,
+    Transaction.card_id
+).where(
+    Transaction.account_id == bindparam("aid")
+).order_by(Transaction.created_at.desc())
+_STATUS_BY_ID = select(Account.status, Account.balance_cents).where(
+    Account.id == bindparam("aid"),
+    Account.user_id == bindparam("uid")
+)
+
+# list adapter built once -> validate ORM rows and dump JSON bytes directly
+_ACCOUNT_LIST = TypeAdapter(List[AccountOut])
+
+
+def _stream_json_array(batches, to_dict):
+    """Yield a JSON array one batch of rows at a time -> memory bounded by the batch, not the result."""
+    yield b"["
+    first = True
+    for batch in batches:
+        # dump the batch as a list and strip its brackets -> rows joined into the outer array
+        body = orjson.dumps([to_dict(row) for row in batch])[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def _set_status(db: Session, id: UUID, user_id: UUID, new_status: AccountStatus, *guards):
+    """
+    Move an owned account to new_status in one conditional UPDATE ... RETURNING.
+    Returns None when no row matched (missing, not owned, or a guard failed).
+    """
+    # check and write happen in one statement -> no window between reading status and updating it
+    return db.execute(
+        update(Account)
+        .where(Account.id == id, Account.user_id == user_id, *guards)
+        .values(status=new_status)
+        .returning(Account)
+    ).scalar_one_or_none()
+
+
+def _current_status(db: Session, id: UUID, user_id: UUID):
+    """Cold path after a failed _set_status -> (status, balance_cents) row, or None if not found."""
+    return db.execute(_STATUS_BY_ID, {"aid": id, "uid": user_id}).one_or_none()
+
+
 # Create account
 @router.post("", response_model=AccountOut, status_code=201)
 @limiter.limit("20/minute")
 def create_account(
     request: Request,
     account: AccountCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -29,13 +93,12 @@ def create_account(
     db_account = Account(
         user_id=current_user.id,
         type=account.type,
-        balance=0.0,
+        balance_cents=0,
         status=AccountStatus.ACTIVE
     )
 
     db.add(db_account)
     db.commit()
-    db.refresh(db_account)
 
     return db_account
 
@@ -44,14 +107,17 @@ def create_account(
 @limiter.limit("100/minute")
 def get_accounts(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """
     Retrieve all accounts for the current user.
     """
-    accounts = db.execute(select(Account).filter(Account.user_id == current_user.id)).scalars().all()
-    return accounts
+    accounts = db.execute(_ACCOUNTS_BY_USER, {"uid": current_user.id}).scalars().all()
+    return Response(
+        content=_ACCOUNT_LIST.dump_json(_ACCOUNT_LIST.validate_python(accounts)),
+        media_type="application/json"
+    )
 
 
 # Get specific account by ID
@@ -60,17 +126,16 @@ def get_accounts(
 def get_account(
     request: Request,
     id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """
     Get details for a specific account.
     """
     # validate that account belongs to user
-    account = db.execute(select(Account).filter(
-        Account.id == id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    account = db.execute(
+        _ACCOUNT_BY_ID, {"aid": id, "uid": current_user.id}
+    ).scalar_one_or_none()
 
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
@@ -84,25 +149,32 @@ def get_account(
 def get_account_transactions(
     request: Request,
     id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Number of transactions to return"),
+    offset: int = Query(0, ge=0, description="Number of transactions to skip"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """
-    Get all transactions for a specific account.
+    Get transactions for a specific account, newest first.
     """
-    account = db.execute(select(Account).filter(
-        Account.id == id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    account = db.execute(
+        _ACCOUNT_BY_ID, {"aid": id, "uid": current_user.id}
+    ).scalar_one_or_none()
 
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    transactions = db.execute(select(Transaction).filter(
-        Transaction.account_id == id
-    ).order_by(Transaction.created_at.desc())).scalars().all()
+    # yield_per -> rows fetched 500 at a time; the session stays open until the stream finishes
+    # since yield-dependency teardown runs after the response is sent
+    rows = db.execute(
+        _TX_ROWS_BY_ACCOUNT.limit(limit).offset(offset).execution_options(yield_per=500),
+        {"aid": id}
+    )
 
-    return transactions
+    return StreamingResponse(
+        _stream_json_array(rows.partitions(), TransactionOut.dict_from_row),
+        media_type="application/json"
+    )
 
 
 # Freeze account
@@ -111,34 +183,33 @@ def get_account_transactions(
 def freeze_account(
     request: Request,
     id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Freeze an account to prevent transactions."""
 
-    account = db.execute(select(Account).filter(
-        Account.id == id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    account = _set_status(
+        db, id, current_user.id, AccountStatus.FROZEN,
+        Account.status == AccountStatus.ACTIVE
+    )
 
     if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+        current = _current_status(db, id, current_user.id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Account not found")
 
-    if account.status == AccountStatus.CLOSED:
-        raise HTTPException(
-            status_code=400,
-            detail="Cannot freeze a closed account"
-        )
+        if current.status == AccountStatus.CLOSED:
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot freeze a closed account"
+            )
 
-    if account.status == AccountStatus.FROZEN:
         raise HTTPException(
             status_code=400,
             detail="Account is already frozen"
         )
 
-    account.status = AccountStatus.FROZEN
     db.commit()
-    db.refresh(account)
 
     return account
 
@@ -149,28 +220,26 @@ def freeze_account(
 def unfreeze_account(
     request: Request,
     id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Unfreeze an account to allow transactions."""
 
-    account = db.execute(select(Account).filter(
-        Account.id == id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    account = _set_status(
+        db, id, current_user.id, AccountStatus.ACTIVE,
+        Account.status == AccountStatus.FROZEN
+    )
 
     if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+        if _current_status(db, id, current_user.id) is None:
+            raise HTTPException(status_code=404, detail="Account not found")
 
-    if account.status != AccountStatus.FROZEN:
         raise HTTPException(
             status_code=400,
             detail="Account is not frozen"
         )
 
-    account.status = AccountStatus.ACTIVE
     db.commit()
-    db.refresh(account)
 
     return account
 
@@ -181,36 +250,34 @@ def unfreeze_account(
 def close_account(
     request: Request,
     id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Close an account permanently. Account must have zero balance."""
 
-    account = db.execute(select(Account).filter(
-        Account.id == id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    account = _set_status(
+        db, id, current_user.id, AccountStatus.CLOSED,
+        Account.status != AccountStatus.CLOSED,
+        Account.balance_cents == 0
+    )
 
     if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+        current = _current_status(db, id, current_user.id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Account not found")
 
-    if account.status == AccountStatus.CLOSED:
-        raise HTTPException(
-            status_code=400,
-            detail="Account is already closed"
-        )
+        if current.status == AccountStatus.CLOSED:
+            raise HTTPException(
+                status_code=400,
+                detail="Account is already closed"
+            )
 
-    # Check for zero balance
-    if account.balance != 0:
+        # only other guard that can fail is the zero balance check
         raise HTTPException(
             status_code=400,
             detail="Cannot close account with non-zero balance. Please withdraw or transfer all funds first."
         )
 
-    account.status = AccountStatus.CLOSED
     db.commit()
-    db.refresh(account)
 
     return account
-
-
@@ -1,16 +1,18 @@
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
-from jose import jwt
+import jwt
 from datetime import datetime, timedelta
-from uuid import UUID
-from ..security import get_current_user
+from ..security import get_current_user, AuthUser
 from ..security import limiter
 
-from ..database import get_db
+from ..database import get_db, get_db_ro
 from ..models import User
 from ..schemas import UserCreate, Token, UserOut
 
@@ -20,13 +22,26 @@ load_dotenv()
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# bcrypt cost doubles per round -> pinned explicitly instead of inheriting passlib's default
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
 
 # auth routes
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # handle password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# native bcrypt backend, modern $2b$ ident; hashes at other costs still verify
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__ident="2b",
+    deprecated="auto"
+)
+
+# successful verifies only, short TTL -> a retried login skips a second bcrypt round
+# keyed on (hash, sha256(password)) so the plaintext is never held in memory
+_VERIFY_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_VERIFY_CACHE_LOCK = threading.Lock()
 
 
 # =================================================================
@@ -37,12 +52,26 @@ def hash_password(password: str) -> str:
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    key = (hashed, hashlib.sha256(password.encode("utf-8")).digest())
+    with _VERIFY_CACHE_LOCK:
+        if key in _VERIFY_CACHE:
+            return True
+
+    if not pwd_context.verify(password, hashed):
+        return False
+
+    with _VERIFY_CACHE_LOCK:
+        _VERIFY_CACHE[key] = True
+    return True
 
 
-def create_access_token(user_id: UUID):
+def create_access_token(user: User):
+    # identity claims ride in the signed token -> get_current_user never hits the db
     payload = {
-        "sub": str(user_id),
+        "sub": str(user.id),
+        "email": user.email,
+        "role": user.role.value,
+        "ver": user.token_version,
         "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -51,10 +80,14 @@ def create_access_token(user_id: UUID):
 # =================================================================
 # Auth routes
 # =================================================================
+# sync handlers -> FastAPI runs them on the threadpool, so bcrypt never blocks the event loop
 @router.post("/signup", response_model=Token)
 @limiter.limit("5/minute")
 def signup(request: Request, user: UserCreate, db: Session = Depends(get_db)):
 
+    # hash before the first query -> the single writer connection (BEGIN IMMEDIATE) isn't held through bcrypt
+    hashed_password = hash_password(user.password)
+
     # check if email exists - idempotency
     if db.execute(select(User).filter(User.email == user.email)).scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -62,36 +95,54 @@ def signup(request: Request, user: UserCreate, db: Session = Depends(get_db)):
     # create user
     db_user = User(
         email=user.email,
-        hashed_password=hash_password(user.password)
+        hashed_password=hashed_password
     )
 
     # add user to db
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
 
     # user access token
-    token = create_access_token(db_user.id)
+    token = create_access_token(db_user)
     return {"access_token": token}
 
 
 @router.post("/login", response_model=Token)
 @limiter.limit("10/minute")
-def login(request: Request, user: UserCreate, db: Session = Depends(get_db)):
+def login(request: Request, user: UserCreate, db: Session = Depends(get_db_ro)):
 
+    # read-only lookup -> a reader connection, never the writer, while bcrypt runs
     db_user = db.execute(select(User).filter(User.email == user.email)).scalar_one_or_none()
 
     # validate user password
     if not db_user or not verify_password(user.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token(db_user.id)
+    token = create_access_token(db_user)
     return {"access_token": token}
 
 
+@router.post("/logout", status_code=204)
+@limiter.limit("10/minute")
+def logout(
+    request: Request,
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke every access token issued to the current user so far."""
+    # tokens carry the version they were issued at -> get_current_user rejects any older one
+    db.execute(
+        update(User)
+        .filter(User.id == current_user.id)
+        .values(token_version=User.token_version + 1)
+    )
+    db.commit()
+    return Response(status_code=204)
+
+
 @router.get("/me", response_model=UserOut)
 @limiter.limit("60/minute")
-def me(request: Request, current_user: User = Depends(get_current_user)):
+def me(request: Request, current_user: AuthUser = Depends(get_current_user)):
     return current_user
 
 
@@ -1,48 +1,82 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import List
 from uuid import UUID
-from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
+from datetime import datetime, timedelta
 import secrets
 import hmac
 import hashlib
 import os
 
-from ..database import get_db
-from ..models import Card, Account, User, CardType, CardStatus, AccountStatus
-from ..schemas import CardCreate, CardOut, CardCreateResponse
-from ..security import get_current_user
+from ..database import get_db, get_db_ro
+from ..models import Card, Account, CardType, CardStatus, AccountStatus
+from ..schemas import CardCreate, CardOut, CardCreateResponse, to_cents
+from ..security import get_current_user, AuthUser
 from ..security import limiter
 
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
-# PIN hashing manager
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 CVV_SECRET = os.getenv("CVV_SECRET")
+PIN_PEPPER = os.getenv("PIN_PEPPER")
+
+# fail at startup, not as an AttributeError on the first card -> the pepper keys every PIN hash
+if not PIN_PEPPER:
+    raise RuntimeError("PIN_PEPPER is not set")
+
+# listing columns -> only the last 4 digits are read back, sliced in SQL (portable substr, no right())
+_CARD_OUT_COLUMNS = (
+    Card.id,
+    Card.account_id,
+    func.substr(Card.card_number, func.length(Card.card_number) - 3).label("last4"),
+    Card.card_holder_name,
+    Card.expiry_date,
+    Card.card_type,
+    Card.status,
+    Card.spending_limit_cents,
+    Card.created_at
+)
+
+# keyed HMAC states built once -> each call copies one instead of redoing the key schedule
+_CVV_HMAC = hmac.new(CVV_SECRET.encode('utf-8'), None, hashlib.sha256)
+_PIN_HMAC = hmac.new(PIN_PEPPER.encode('utf-8'), None, hashlib.sha256)
 
 
 def generate_card_number():
     """Generate a random 16-digit card number."""
-    return "".join([str(secrets.randbelow(10)) for _ in range(16)])
+    # one CSPRNG draw for all digits; bytes >= 250 are rejected so every digit stays uniform
+    digits = ""
+    while len(digits) < 16:
+        digits += "".join(str(b % 10) for b in secrets.token_bytes(20) if b < 250)
+    return digits[:16]
 
 
-def generate_cvv(card_number: str, expiry_date: datetime) -> str:
-    """
-    Generate a 3-digit CVV using HMAC-SHA256.
-    Based on card number + expiry date + secret key.
-    Can be regenerated for validation without storage (PCI DSS compliant).
+def _unused_card_number(db: Session, batch: int = 8):
+    """Pick a candidate card number not already taken, probing the whole batch in one IN query."""
+    candidates = [generate_card_number() for _ in range(batch)]
+    taken = set(db.execute(
+        select(Card.card_number).where(Card.card_number.in_(candidates))
+    ).scalars())
+    return next((c for c in candidates if c not in taken), None)
 
-    Args:
-        card_number: 16-digit card number
-        expiry_date: Card expiry datetime
 
-    Returns:
-        3-digit CVV string
+def hash_pin(account_id: UUID, pin: str) -> str:
+    """
+    Hash a card PIN with HMAC-SHA256 keyed by the server-side PIN_PEPPER.
+
+    A 4-digit PIN has only 10^4 values, so bcrypt's work factor adds nothing
+    against an attacker holding the hash; the secret pepper is what protects it.
+    Binding the account id means equal PINs don't produce equal hashes.
     """
+    mac = _PIN_HMAC.copy()
+    mac.update(f"{account_id}:{pin}".encode('utf-8'))
+    return mac.hexdigest()
+
+
+def _cvv_int(card_number: str, expiry_date: datetime) -> int:
+    """CVV as an int: first 4 bytes of HMAC-SHA256(card_number:YYYYMM) mod 1000."""
     # Create message from card data
     # expiry --> YYYYMM format
     expiry_str = expiry_date.strftime("%Y%m")
@@ -51,17 +85,28 @@ def generate_cvv(card_number: str, expiry_date: datetime) -> str:
     message = f"{card_number}:{expiry_str}".encode('utf-8')
 
     # Generate HMAC-SHA256
-    signature = hmac.new(
-        CVV_SECRET.encode('utf-8'),
-        message,
-        hashlib.sha256
-    ).hexdigest()
+    mac = _CVV_HMAC.copy()
+    mac.update(message)
+
+    # first 4 bytes as an int (same value as the first 8 hex chars) -> no hexdigest
+    return int.from_bytes(mac.digest()[:4], 'big') % 1000
+
+
+def generate_cvv(card_number: str, expiry_date: datetime) -> str:
+    """
+    Generate a 3-digit CVV using HMAC-SHA256.
+    Based on card number + expiry date + secret key.
+    Can be regenerated for validation without storage (PCI DSS compliant).
 
-    # Take first 3 digits from hex to use as cvv
-    cvv_int = int(signature[:8], 16) % 1000
+    Args:
+        card_number: 16-digit card number
+        expiry_date: Card expiry datetime
 
+    Returns:
+        3-digit CVV string
+    """
     # Format as 3-digit string, including leading zeros if necessary
-    return f"{cvv_int:03d}"
+    return f"{_cvv_int(card_number, expiry_date):03d}"
 
 
 
@@ -77,8 +122,36 @@ def validate_cvv(card_number: str, expiry_date: datetime, provided_cvv: str) ->
     Returns:
         True if CVV is valid, False otherwise
     """
-    expected_cvv = generate_cvv(card_number, expiry_date)
-    return expected_cvv == provided_cvv
+    expected = b"%03d" % _cvv_int(card_number, expiry_date)
+    # constant-time compare -> response timing doesn't leak how many digits matched
+    return hmac.compare_digest(expected, provided_cvv.encode('utf-8'))
+
+
+def _set_card_status(db: Session, card_id: UUID, user_id: UUID, new_status: CardStatus, *guards):
+    """
+    Move an owned card to new_status in one conditional UPDATE ... RETURNING.
+    Returns None when no row matched (missing, not owned, or a guard failed).
+    """
+    owned = select(Account.id).where(
+        Account.id == Card.account_id,
+        Account.user_id == user_id
+    ).exists()
+
+    # one statement per card write -> no read-then-write window, and the account row is never touched
+    return db.execute(
+        update(Card)
+        .where(Card.id == card_id, owned, *guards)
+        .values(status=new_status)
+        .returning(Card)
+    ).scalar_one_or_none()
+
+
+def _current_card_status(db: Session, card_id: UUID, user_id: UUID):
+    """Cold path after a failed _set_card_status -> the card's status, or None if not found."""
+    return db.execute(select(Card.status).join(Account).filter(
+        Card.id == card_id,
+        Account.user_id == user_id
+    )).scalar_one_or_none()
 
 
 @router.post("", response_model=CardCreateResponse, status_code=201)
@@ -86,7 +159,7 @@ def validate_cvv(card_number: str, expiry_date: datetime, provided_cvv: str) ->
 def create_card(
     request: Request,
     card: CardCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new card for an account."""
@@ -118,45 +191,57 @@ def create_card(
             detail="PIN must be exactly 4 digits"
         )
 
-    # Generate unique card number using cryptographically secure random
-    max_attempts = 100
-    card_number = None
-    for _ in range(max_attempts):
-        card_number = generate_card_number()
-        exists = db.execute(select(Card).filter(Card.card_number == card_number)).scalar_one_or_none()
-        if not exists:
-            break
+    pin_hash = hash_pin(account.id, card.pin)
 
-    if not card_number:
+    # Set expiry date to 3 years from now
+    # naive UTC, like every stored DateTime -> the create response matches what GET reads back
+    expiry_date = datetime.utcnow() + timedelta(days=365 * 3)
+
+    # rollback expires the account -> read the id once, before any retry
+    account_id = account.id
+    spending_limit_cents = None if card.spending_limit is None else to_cents(card.spending_limit)
+
+    # card_number is UNIQUE -> insert straight away and let the db reject the rare collision
+    max_attempts = 3
+    db_card = None
+    for attempt in range(max_attempts):
+        # first try blind; after a collision screen a batch of candidates in one query
+        card_number = generate_card_number() if attempt == 0 else _unused_card_number(db)
+        if card_number is None:
+            continue
+
+        # Create card WITHOUT storing CVV
+        db_card = Card(
+            account_id=account_id,
+            card_number=card_number,
+            card_holder_name=card.card_holder_name,
+            pin_hash=pin_hash,
+            card_type=card.card_type,
+            expiry_date=expiry_date,
+            status=CardStatus.ACTIVE,
+            spending_limit_cents=spending_limit_cents
+        )
+
+        db.add(db_card)
+        try:
+            db.commit()
+            break
+        except IntegrityError as e:
+            db.rollback()
+            db_card = None
+            # only a card number collision is worth another attempt
+            if "card_number" not in str(e.orig):
+                raise HTTPException(status_code=400, detail="Database integrity error")
+
+    if db_card is None:
         raise HTTPException(
             status_code=500,
             detail="Failed to generate unique card number. Please try again."
         )
 
-    pin_hash = pwd_context.hash(card.pin)
-
-    # Set expiry date to 3 years from now
-    expiry_date = datetime.now(timezone.utc) + timedelta(days=365 * 3)
-
     # Generate CVV deterministically (not stored in database - PCI DSS compliant)
     cvv = generate_cvv(card_number, expiry_date)
 
-    # Create card WITHOUT storing CVV
-    db_card = Card(
-        account_id=account.id,
-        card_number=card_number,
-        card_holder_name=card.card_holder_name,
-        pin_hash=pin_hash,
-        card_type=card.card_type,
-        expiry_date=expiry_date,
-        status=CardStatus.ACTIVE,
-        spending_limit=card.spending_limit
-    )
-
-    db.add(db_card)
-    db.commit()
-    db.refresh(db_card)
-
     # Return response with CVV (only time it's ever returned)
     return CardCreateResponse(
         id=db_card.id,
@@ -177,16 +262,16 @@ def create_card(
 @limiter.limit("100/minute")
 def get_cards(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """Retrieve all cards for the current user's accounts with masked card numbers."""
 
-    cards = db.execute(select(Card).join(Account).filter(
+    rows = db.execute(select(*_CARD_OUT_COLUMNS).join(Account).filter(
         Account.user_id == current_user.id
-    )).scalars().all()
+    ))
 
-    return [CardOut.from_card(card) for card in cards]
+    return [CardOut.from_row(row) for row in rows]
 
 
 @router.get("/{card_id}", response_model=CardOut)
@@ -194,23 +279,23 @@ def get_cards(
 def get_card(
     request: Request,
     card_id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """Get details for a specific card with masked card number."""
 
-    card = db.execute(select(Card).join(Account).filter(
+    row = db.execute(select(*_CARD_OUT_COLUMNS).join(Account).filter(
         Card.id == card_id,
         Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    )).one_or_none()
 
-    if not card:
+    if not row:
         raise HTTPException(
             status_code=404,
             detail="Card not found or you don't have access"
         )
 
-    return CardOut.from_card(card)
+    return CardOut.from_row(row)
 
 
 @router.patch("/{card_id}/freeze", response_model=CardOut)
@@ -218,37 +303,36 @@ def get_card(
 def freeze_card(
     request: Request,
     card_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Freeze a card to prevent transactions."""
 
-    card = db.execute(select(Card).join(Account).filter(
-        Card.id == card_id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    card = _set_card_status(
+        db, card_id, current_user.id, CardStatus.FROZEN,
+        Card.status == CardStatus.ACTIVE
+    )
 
     if not card:
-        raise HTTPException(
-            status_code=404,
-            detail="Card not found or you don't have access"
-        )
+        status = _current_card_status(db, card_id, current_user.id)
+        if status is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Card not found or you don't have access"
+            )
+
+        if status == CardStatus.CANCELLED:
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot freeze a cancelled card"
+            )
 
-    if card.status == CardStatus.CANCELLED:
-        raise HTTPException(
-            status_code=400,
-            detail="Cannot freeze a cancelled card"
-        )
-
-    if card.status == CardStatus.FROZEN:
         raise HTTPException(
             status_code=400,
             detail="Card is already frozen"
         )
 
-    card.status = CardStatus.FROZEN
     db.commit()
-    db.refresh(card)
 
     return CardOut.from_card(card)
 
@@ -258,31 +342,29 @@ def freeze_card(
 def unfreeze_card(
     request: Request,
     card_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Unfreeze a card to allow transactions."""
 
-    card = db.execute(select(Card).join(Account).filter(
-        Card.id == card_id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    card = _set_card_status(
+        db, card_id, current_user.id, CardStatus.ACTIVE,
+        Card.status == CardStatus.FROZEN
+    )
 
     if not card:
-        raise HTTPException(
-            status_code=404,
-            detail="Card not found or you don't have access"
-        )
+        if _current_card_status(db, card_id, current_user.id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Card not found or you don't have access"
+            )
 
-    if card.status != CardStatus.FROZEN:
         raise HTTPException(
             status_code=400,
             detail="Card is not frozen"
         )
 
-    card.status = CardStatus.ACTIVE
     db.commit()
-    db.refresh(card)
 
     return CardOut.from_card(card)
 
@@ -292,30 +374,28 @@ def unfreeze_card(
 def cancel_card(
     request: Request,
     card_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Cancel a card permanently."""
 
-    card = db.execute(select(Card).join(Account).filter(
-        Card.id == card_id,
-        Account.user_id == current_user.id
-    )).scalar_one_or_none()
+    card = _set_card_status(
+        db, card_id, current_user.id, CardStatus.CANCELLED,
+        Card.status != CardStatus.CANCELLED
+    )
 
     if not card:
-        raise HTTPException(
-            status_code=404,
-            detail="Card not found or you don't have access"
-        )
+        if _current_card_status(db, card_id, current_user.id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Card not found or you don't have access"
+            )
 
-    if card.status == CardStatus.CANCELLED:
         raise HTTPException(
             status_code=400,
             detail="Card is already cancelled"
         )
 
-    card.status = CardStatus.CANCELLED
     db.commit()
-    db.refresh(card)
 
     return CardOut.from_card(card)
@@ -1,25 +1,110 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse, Response
-from sqlalchemy import select
+from sqlalchemy import select, func, case
 from sqlalchemy.orm import Session
 from uuid import UUID
 from datetime import datetime
-from decimal import Decimal
 import io
+import os
 import csv
+import threading
+import orjson
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.units import inch
 
-from ..database import get_db
-from ..models import Account, User, Transaction, TransactionDirection
-from ..security import get_current_user, limiter
+from ..database import get_db_ro
+from ..models import Account, Transaction, TransactionDirection
+from ..security import get_current_user, AuthUser, limiter
 
 
 router = APIRouter(prefix="/statements", tags=["statements"])
 
+# PDF layout objects are immutable -> built once at import, shared by every statement
+_PDF_STYLES = getSampleStyleSheet()
+_PDF_INFO_COL_WIDTHS = [2*inch, 4*inch]
+_PDF_TXN_COL_WIDTHS = [1.2*inch, 2*inch, 1.2*inch, 1*inch, 1*inch, 1*inch]
+_PDF_ROWS_PER_TABLE = 500
+_PDF_INFO_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+_PDF_TXN_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+_PDF_TXN_HEADER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+], parent=_PDF_TXN_STYLE)
+_PDF_SUMMARY_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),
+])
+
+# PDF builds are seconds of CPU for long statements -> cap them so they can't drain the shared threadpool
+_PDF_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+
+class _Echo:
+    """File-like sink for csv.writer -> writerow returns the formatted line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def _money(cents: int) -> str:
+    """Format integer cents as a 2-decimal amount string."""
+    return f"{cents / 100:.2f}"
+
+
+def _render_pdf(account_info, data) -> bytes:
+    """Lay out and build the statement PDF (ReportLab, CPU-bound)."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+
+    # Title
+    title = Paragraph("<b>Account Statement</b>", _PDF_STYLES['Title'])
+    elements.append(title)
+    elements.append(Spacer(1, 0.2 * inch))
+
+    info_table = Table(account_info, colWidths=_PDF_INFO_COL_WIDTHS)
+    info_table.setStyle(_PDF_INFO_STYLE)
+    elements.append(info_table)
+    elements.append(Spacer(1, 0.3 * inch))
+
+    # Transactions table
+    if data:
+        header, rows, summary = data[0], data[1:-4], data[-4:]
+
+        # fixed-size tables -> ReportLab's layout/split work stays per chunk instead of growing with the statement
+        for i in range(0, len(rows), _PDF_ROWS_PER_TABLE):
+            chunk = rows[i:i + _PDF_ROWS_PER_TABLE]
+            table = Table([header] + chunk if i == 0 else chunk, colWidths=_PDF_TXN_COL_WIDTHS)
+            table.setStyle(_PDF_TXN_HEADER_STYLE if i == 0 else _PDF_TXN_STYLE)
+            elements.append(table)
+
+        summary_table = Table(summary, colWidths=_PDF_TXN_COL_WIDTHS)
+        summary_table.setStyle(_PDF_SUMMARY_STYLE)
+        elements.append(summary_table)
+    else:
+        no_txn_text = Paragraph("No transactions found in this period.", _PDF_STYLES['Normal'])
+        elements.append(no_txn_text)
+
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
 
 @router.get("/account/{account_id}")
 @limiter.limit("30/minute")
@@ -29,8 +114,9 @@ def generate_account_statement(
     start_date: datetime = Query(..., description="Statement start date (ISO format)"),
     end_date: datetime = Query(..., description="Statement end date (ISO format)"),
     format: str = Query("json", description="Format: json, csv, or pdf"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    include_transactions: bool = Query(True, description="JSON only: include the per-transaction list"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
     """Generate account statement in JSON, CSV, or PDF format."""
 
@@ -50,34 +136,61 @@ def generate_account_statement(
             detail="Start date must be before end date"
         )
 
-    # Fetch transactions in date range
-    transactions = db.execute(select(Transaction).filter(
+    in_period = (
         Transaction.account_id == account_id,
         Transaction.created_at >= start_date,
         Transaction.created_at <= end_date
-    ).order_by(Transaction.created_at.asc())).scalars().all()
+    )
 
-    # Calculate opening balance (all transactions before start_date)
-    opening_transactions = db.execute(select(Transaction).filter(
-        Transaction.account_id == account_id,
-        Transaction.created_at < start_date
-    )).scalars().all()
+    # only the columns a statement line prints -> plain rows, no ORM instance hydration per transaction
+    period_stmt = select(
+        Transaction.created_at,
+        Transaction.description,
+        Transaction.reference,
+        Transaction.type,
+        Transaction.category,
+        Transaction.amount_cents
+    ).filter(*in_period).order_by(Transaction.created_at.asc())
 
-    opening_balance = Decimal("0.00")
-    for txn in opening_transactions:
-        if txn.type == TransactionDirection.CREDIT:
-            opening_balance += txn.amount
-        else:
-            opening_balance -= txn.amount
+    # rows are only loaded up front to render them here -> totals-only JSON skips them, CSV streams them
+    want_rows = format.lower() == "pdf" or (format.lower() == "json" and include_transactions)
 
-    # Calculate totals
-    total_credits = sum(
-        txn.amount for txn in transactions if txn.type == TransactionDirection.CREDIT
-    ) or Decimal("0.00")
+    # Fetch transactions in date range
+    transactions = []
+    if want_rows:
+        transactions = db.execute(period_stmt).all()
 
-    total_debits = sum(
-        txn.amount for txn in transactions if txn.type == TransactionDirection.DEBIT
-    ) or Decimal("0.00")
+    # Calculate opening balance (all transactions before start_date)
+    # summed in the db -> one scalar back instead of every prior row; all totals in integer cents
+    opening_balance = db.execute(select(
+        func.coalesce(func.sum(case(
+            (Transaction.type == TransactionDirection.CREDIT, Transaction.amount_cents),
+            else_=-Transaction.amount_cents
+        )), 0)
+    ).filter(
+        Transaction.account_id == account_id,
+        Transaction.created_at < start_date
+    )).scalar_one()
+
+    if want_rows:
+        # totals from the rows being printed -> the summary can't disagree with the lines above it
+        total_credits = sum(txn.amount_cents for txn in transactions if txn.type == TransactionDirection.CREDIT)
+        total_debits = sum(txn.amount_cents for txn in transactions if txn.type == TransactionDirection.DEBIT)
+        transaction_count = len(transactions)
+    elif format.lower() == "json":
+        # Calculate totals -> one (type, sum, count) row per direction
+        totals = {
+            txn_type: (amount_sum, count)
+            for txn_type, amount_sum, count in db.execute(select(
+                Transaction.type, func.sum(Transaction.amount_cents), func.count()
+            ).filter(*in_period).group_by(Transaction.type))
+        }
+        total_credits, credit_count = totals.get(TransactionDirection.CREDIT, (0, 0))
+        total_debits, debit_count = totals.get(TransactionDirection.DEBIT, (0, 0))
+        transaction_count = credit_count + debit_count
+    else:
+        # CSV totals its footer from the rows it streams -> nothing to aggregate up front
+        total_credits = total_debits = transaction_count = 0
 
     closing_balance = opening_balance + total_credits - total_debits
 
@@ -89,80 +202,97 @@ def generate_account_statement(
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat()
         },
-        "opening_balance": float(opening_balance),
-        "closing_balance": float(closing_balance),
-        "total_credits": float(total_credits),
-        "total_debits": float(total_debits),
-        "transaction_count": len(transactions),
-        "transactions": [
-            {
-                "date": txn.created_at.isoformat(),
-                "description": txn.description,
-                "reference": txn.reference,
-                "type": txn.type.value,
-                "category": txn.category.value,
-                "amount": float(txn.amount),
-                "debit": float(txn.amount) if txn.type == TransactionDirection.DEBIT else 0.0,
-                "credit": float(txn.amount) if txn.type == TransactionDirection.CREDIT else 0.0
-            }
-            for txn in transactions
-        ]
+        "opening_balance": opening_balance / 100,
+        "closing_balance": closing_balance / 100,
+        "total_credits": total_credits / 100,
+        "total_debits": total_debits / 100,
+        "transaction_count": transaction_count
     }
 
     # Return based on format
     if format.lower() == "json":
-        return statement_data
+        if include_transactions:
+            lines = []
+            for txn in transactions:
+                amount = txn.amount_cents / 100
+                is_credit = txn.type == TransactionDirection.CREDIT
+                lines.append({
+                    "date": txn.created_at.isoformat(),
+                    "description": txn.description,
+                    "reference": txn.reference,
+                    "type": txn.type.value,
+                    "category": txn.category.value,
+                    "amount": amount,
+                    "debit": 0.0 if is_credit else amount,
+                    "credit": amount if is_credit else 0.0
+                })
+            statement_data["transactions"] = lines
+
+        # untyped dict -> no response_model fast path, encode with orjson instead of stdlib json
+        return Response(content=orjson.dumps(statement_data), media_type="application/json")
 
     elif format.lower() == "csv":
         # Generate CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Header info
-        writer.writerow(["Account Statement"])
-        writer.writerow(["Account ID", str(account.id)])
-        writer.writerow(["Account Type", account.type.value])
-        writer.writerow(["Period", f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"])
-        writer.writerow(["Opening Balance", f"{opening_balance:.2f}"])
-        writer.writerow([])
-
-        # Transaction headers
-        writer.writerow(["Date", "Description", "Reference", "Category", "Debit", "Credit", "Balance"])
-
-        # Transactions
-        running_balance = opening_balance
-        for txn in transactions:
-            if txn.type == TransactionDirection.CREDIT:
-                running_balance += txn.amount
-                debit_amt = ""
-                credit_amt = f"{txn.amount:.2f}"
-            else:
-                running_balance -= txn.amount
-                debit_amt = f"{txn.amount:.2f}"
-                credit_amt = ""
-
-            writer.writerow([
-                txn.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                txn.description or "",
-                txn.reference or "",
-                txn.category.value,
-                debit_amt,
-                credit_amt,
-                f"{running_balance:.2f}"
+        # streamed straight off a yield_per cursor -> memory stays one batch deep for any period length
+        def csv_stream():
+            writer = csv.writer(_Echo())
+
+            # Header info
+            yield "".join([
+                writer.writerow(["Account Statement"]),
+                writer.writerow(["Account ID", account_id_str]),
+                writer.writerow(["Account Type", account_type]),
+                writer.writerow(["Period", f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"]),
+                writer.writerow(["Opening Balance", _money(opening_balance)]),
+                writer.writerow([]),
+                # Transaction headers
+                writer.writerow(["Date", "Description", "Reference", "Category", "Debit", "Credit", "Balance"])
             ])
 
-        # Footer
-        writer.writerow([])
-        writer.writerow(["Closing Balance", "", "", "", "", "", f"{closing_balance:.2f}"])
-        writer.writerow(["Total Debits", "", "", "", f"{total_debits:.2f}", "", ""])
-        writer.writerow(["Total Credits", "", "", "", "", f"{total_credits:.2f}", ""])
+            # Transactions
+            # the footer is totalled from these same rows -> closing line always equals the last running balance
+            running_balance = opening_balance
+            total_debits = total_credits = 0
+            rows = db.execute(period_stmt.execution_options(yield_per=1000))
+            for batch in rows.partitions():
+                lines = []
+                for txn in batch:
+                    if txn.type == TransactionDirection.CREDIT:
+                        running_balance += txn.amount_cents
+                        total_credits += txn.amount_cents
+                        debit_amt = ""
+                        credit_amt = _money(txn.amount_cents)
+                    else:
+                        running_balance -= txn.amount_cents
+                        total_debits += txn.amount_cents
+                        debit_amt = _money(txn.amount_cents)
+                        credit_amt = ""
+
+                    lines.append(writer.writerow([
+                        txn.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                        txn.description or "",
+                        txn.reference or "",
+                        txn.category.value,
+                        debit_amt,
+                        credit_amt,
+                        _money(running_balance)
+                    ]))
+                yield "".join(lines)
+
+            # Footer
+            yield "".join([
+                writer.writerow([]),
+                writer.writerow(["Closing Balance", "", "", "", "", "", _money(running_balance)]),
+                writer.writerow(["Total Debits", "", "", "", _money(total_debits), "", ""]),
+                writer.writerow(["Total Credits", "", "", "", "", _money(total_credits), ""])
+            ])
 
         # Return CSV response
-        csv_content = output.getvalue()
-        output.close()
+        account_id_str = str(account.id)
+        account_type = account.type.value
 
-        return Response(
-            content=csv_content,
+        return StreamingResponse(
+            csv_stream(),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=statement_{account.id}_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
@@ -171,46 +301,28 @@ def generate_account_statement(
 
     elif format.lower() == "pdf":
         # Generate PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Title
-        title = Paragraph("<b>Account Statement</b>", styles['Title'])
-        elements.append(title)
-        elements.append(Spacer(1, 0.2 * inch))
-
         # Account info
         account_info = [
             ["Account ID:", str(account.id)],
             ["Account Type:", account.type.value],
             ["Statement Period:", f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"],
-            ["Opening Balance:", f"${opening_balance:.2f}"]
+            ["Opening Balance:", f"${_money(opening_balance)}"]
         ]
 
-        info_table = Table(account_info, colWidths=[2*inch, 4*inch])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(info_table)
-        elements.append(Spacer(1, 0.3 * inch))
-
         # Transactions table
+        data = None
         if transactions:
             data = [["Date", "Description", "Category", "Debit", "Credit", "Balance"]]
 
             running_balance = opening_balance
             for txn in transactions:
                 if txn.type == TransactionDirection.CREDIT:
-                    running_balance += txn.amount
+                    running_balance += txn.amount_cents
                     debit_amt = ""
-                    credit_amt = f"${txn.amount:.2f}"
+                    credit_amt = f"${_money(txn.amount_cents)}"
                 else:
-                    running_balance -= txn.amount
-                    debit_amt = f"${txn.amount:.2f}"
+                    running_balance -= txn.amount_cents
+                    debit_amt = f"${_money(txn.amount_cents)}"
                     credit_amt = ""
 
                 data.append([
@@ -219,39 +331,22 @@ def generate_account_statement(
                     txn.category.value,
                     debit_amt,
                     credit_amt,
-                    f"${running_balance:.2f}"
+                    f"${_money(running_balance)}"
                 ])
 
             # Summary row
             data.append(["", "", "", "", "", ""])
-            data.append(["", "", "Total Debits:", f"${total_debits:.2f}", "", ""])
-            data.append(["", "", "Total Credits:", "", f"${total_credits:.2f}", ""])
-            data.append(["", "", "Closing Balance:", "", "", f"${closing_balance:.2f}"])
-
-            table = Table(data, colWidths=[1.2*inch, 2*inch, 1.2*inch, 1*inch, 1*inch, 1*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('GRID', (0, 0), (-1, -5), 1, colors.black),
-                ('FONTNAME', (0, -4), (-1, -1), 'Helvetica-Bold'),
-                ('LINEABOVE', (0, -4), (-1, -4), 2, colors.black),
-            ]))
-            elements.append(table)
-        else:
-            no_txn_text = Paragraph("No transactions found in this period.", styles['Normal'])
-            elements.append(no_txn_text)
+            data.append(["", "", "Total Debits:", f"${_money(total_debits)}", "", ""])
+            data.append(["", "", "Total Credits:", "", f"${_money(total_credits)}", ""])
+            data.append(["", "", "Closing Balance:", "", "", f"${_money(closing_balance)}"])
 
-        # Build PDF
-        doc.build(elements)
-        buffer.seek(0)
+        # rendered before any header is sent -> a build failure is a clean 500, not a truncated 200;
+        # sync handler -> already on a threadpool worker, only the slot count needs bounding
+        with _PDF_SLOTS:
+            pdf_bytes = _render_pdf(account_info, data)
 
-        return StreamingResponse(
-            buffer,
+        return Response(
+            content=pdf_bytes,
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename=statement_{account.id}_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.pdf"
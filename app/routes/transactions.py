@@ -1,92 +1,139 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy import select
+from fastapi.responses import Response
+import base64
+import orjson
+from sqlalchemy import insert, lambda_stmt, select, tuple_, type_coerce, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from decimal import Decimal
 from typing import List, Optional
 from uuid import UUID
 
-from ..database import get_db
-from ..models import Account, User, Transaction, TransactionDirection, AccountStatus, TransactionCategory, Card, CardStatus
-from ..schemas import DepositCreate, WithdrawalCreate, TransactionOut, CardPaymentCreate
-from ..security import get_current_user
+from ..database import get_db, get_db_ro
+from ..models import Account, Transaction, TransactionDirection, AccountStatus, TransactionCategory, Card, CardStatus
+from ..schemas import DepositCreate, WithdrawalCreate, TransactionOut, CardPaymentCreate, to_cents
+from ..security import get_current_user, AuthUser
 from ..security import limiter
 from datetime import datetime
 
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+# category filter lookups built once -> no per-request enum scan or join
+_CATEGORY_BY_NAME = {c.name: c for c in TransactionCategory}
+_CATEGORY_NAMES = ", ".join(c.value for c in TransactionCategory)
+
+# exactly the columns TransactionOut reads -> list rows never hydrate entities or touch a relationship
+_TX_OUT_COLUMNS = (
+    Transaction.id,
+    Transaction.account_id,
+    Transaction.type,
+    Transaction.amount_cents,
+    Transaction.description,
+    Transaction.reference,
+    Transaction.created_at,
+    Transaction.category,
+    Transaction.transfer_id,
+    Transaction.card_id
+)
+
+
+def _adjust_balance(db: Session, account_id: UUID, delta_cents: int, *guards):
+    """
+    Add delta_cents to an active account in one conditional UPDATE ... RETURNING.
+    Returns None when no row matched (missing, not active, or a guard failed).
+    """
+    # check and write in one statement -> the row is locked for the UPDATE only, not the whole handler
+    return db.execute(
+        update(Account)
+        .where(Account.id == account_id, Account.status == AccountStatus.ACTIVE, *guards)
+        .values(balance_cents=Account.balance_cents + delta_cents)
+        .returning(Account.id)
+    ).scalar_one_or_none()
+
+
+def _encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    """(created_at, id) from an _encode_cursor string -> 400 if it was tampered with."""
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _insert_transaction(db: Session, **values) -> Transaction:
+    """INSERT ... RETURNING the new Transaction -> no unit-of-work flush, and no refresh SELECT after commit."""
+    return db.execute(insert(Transaction).values(**values).returning(Transaction)).scalar_one()
+
+
+def _balance_error(db: Session, account_id: UUID, user_id: UUID, forbidden_detail: str) -> HTTPException:
+    """Cold path after a failed _adjust_balance -> the error the old step-by-step checks would have raised."""
+    current = db.execute(
+        select(Account.user_id, Account.status, Account.balance_cents).where(Account.id == account_id)
+    ).one_or_none()
+
+    if current is None:
+        return HTTPException(status_code=404, detail="Account not found")
+
+    if current.user_id != user_id:
+        return HTTPException(status_code=403, detail=forbidden_detail)
+
+    if current.status != AccountStatus.ACTIVE:
+        return HTTPException(status_code=400, detail="Account is not active")
+
+    # only other guard that can fail is the funds check
+    return HTTPException(
+        status_code=400,
+        detail=f"Insufficient funds. Available balance: {current.balance_cents / 100:.2f}"
+    )
+
 
 @router.post("/deposit", response_model=TransactionOut, status_code=201)
 @limiter.limit("50/minute")
 def create_deposit(
     request: Request,
     deposit: DepositCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a deposit transaction for an account."""
 
-    # Validate amount is positive
-    if deposit.amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be positive")
-
-    try:
-        # Fetch account with row lock
-        account = db.execute(select(Account).filter(
-            Account.id == deposit.account_id
-        ).with_for_update()).scalar_one_or_none()
-
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
+    amount_cents = to_cents(deposit.amount)
 
-        # Verify account belongs to current user
-        if account.user_id != current_user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You do not have permission to deposit to this account"
-            )
-
-        # Check account is active
-        if account.status != AccountStatus.ACTIVE:
-            raise HTTPException(
-                status_code=400,
-                detail="Account is not active"
-            )
+    # Update account balance (ownership and status checked by the same statement)
+    account_id = _adjust_balance(
+        db, deposit.account_id, amount_cents,
+        Account.user_id == current_user.id
+    )
 
-        # Convert amount to Decimal
-        amount_decimal = Decimal(str(deposit.amount))
+    if account_id is None:
+        raise _balance_error(
+            db, deposit.account_id, current_user.id,
+            "You do not have permission to deposit to this account"
+        )
 
+    try:
         # Create CREDIT transaction (deposit adds money)
-        transaction = Transaction(
-            account_id=account.id,
+        transaction = _insert_transaction(
+            db,
+            account_id=account_id,
+            user_id=current_user.id,
             type=TransactionDirection.CREDIT,
-            amount=amount_decimal,
+            amount_cents=amount_cents,
             description=deposit.description or "Deposit",
             reference=None,
             category=TransactionCategory.DEPOSIT
         )
 
-        db.add(transaction)
-        db.flush()
-
-        # Update account balance
-        account.balance += amount_decimal
-
         db.commit()
-        db.refresh(transaction)
-
-        return transaction
-
-    except HTTPException:
-        db.rollback()
-        raise
     except IntegrityError:
-        db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Deposit failed: {str(e)}")
+
+    return transaction
 
 
 @router.post("/withdrawal", response_model=TransactionOut, status_code=201)
@@ -94,82 +141,44 @@ def create_deposit(
 def create_withdrawal(
     request: Request,
     withdrawal: WithdrawalCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a withdrawal transaction for an account."""
 
-    # Validate amount is positive
-    if withdrawal.amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be positive")
-
-    try:
-        # Fetch account with row lock
-        account = db.execute(select(Account).filter(
-            Account.id == withdrawal.account_id
-        ).with_for_update()).scalar_one_or_none()
+    amount_cents = to_cents(withdrawal.amount)
 
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-
-        # Verify account belongs to current user
-        if account.user_id != current_user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You do not have permission to withdraw from this account"
-            )
-
-        # Check account is active
-        if account.status != AccountStatus.ACTIVE:
-            raise HTTPException(
-                status_code=400,
-                detail="Account is not active"
-            )
-
-        # Convert amount to Decimal
-        amount_decimal = Decimal(str(withdrawal.amount))
+    # Update account balance -> funds guard in the WHERE, so the balance can't go negative between check and write
+    account_id = _adjust_balance(
+        db, withdrawal.account_id, -amount_cents,
+        Account.user_id == current_user.id,
+        Account.balance_cents >= amount_cents
+    )
 
-        # Check sufficient balance
-        if account.balance < amount_decimal:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient funds. Available balance: {account.balance}"
-            )
+    if account_id is None:
+        raise _balance_error(
+            db, withdrawal.account_id, current_user.id,
+            "You do not have permission to withdraw from this account"
+        )
 
+    try:
         # Create DEBIT transaction (withdrawal removes money)
-        transaction = Transaction(
-            account_id=account.id,
+        transaction = _insert_transaction(
+            db,
+            account_id=account_id,
+            user_id=current_user.id,
             type=TransactionDirection.DEBIT,
-            amount=amount_decimal,
+            amount_cents=amount_cents,
             description=withdrawal.description or "Withdrawal",
             reference=None,
             category=TransactionCategory.WITHDRAWAL
         )
 
-        db.add(transaction)
-        db.flush()
-
-        # Update account balance
-        account.balance -= amount_decimal
-
         db.commit()
-        db.refresh(transaction)
-
-        return transaction
-
-    except HTTPException:
-        db.rollback()
-        raise
     except IntegrityError:
-        db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Withdrawal failed: {str(e)}")
-
-
-
 
+    return transaction
 
 
 @router.post("/card-payment", response_model=TransactionOut, status_code=201)
@@ -177,113 +186,111 @@ def create_withdrawal(
 def create_card_payment(
     request: Request,
     payment: CardPaymentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a card payment transaction."""
 
-    # Validate amount is positive
-    if payment.amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be positive")
+    amount_cents = to_cents(payment.amount)
+
+    # Fetch card with its account's status and balance in one row -> every rejection is decided before any write
+    card = db.execute(select(
+        Card.id,
+        Card.account_id,
+        Card.status,
+        Card.expiry_date,
+        Card.spending_limit_cents,
+        Account.status.label("account_status"),
+        Account.balance_cents
+    ).join(Account).filter(
+        Card.id == payment.card_id,
+        Account.user_id == current_user.id
+    )).one_or_none()
 
-    try:
-        # Fetch card with account
-        card = db.execute(select(Card).join(Account).filter(
-            Card.id == payment.card_id,
-            Account.user_id == current_user.id
-        )).scalar_one_or_none()
+    if not card:
+        raise HTTPException(
+            status_code=404,
+            detail="Card not found or you don't have access"
+        )
 
-        if not card:
-            raise HTTPException(
-                status_code=404,
-                detail="Card not found or you don't have access"
-            )
+    # Check card status
+    if card.status == CardStatus.FROZEN:
+        raise HTTPException(
+            status_code=400,
+            detail="Card is frozen. Please unfreeze to make payments."
+        )
 
-        # Check card status
-        if card.status == CardStatus.FROZEN:
-            raise HTTPException(
-                status_code=400,
-                detail="Card is frozen. Please unfreeze to make payments."
-            )
+    if card.status == CardStatus.CANCELLED:
+        raise HTTPException(
+            status_code=400,
+            detail="Card is cancelled and cannot be used."
+        )
 
-        if card.status == CardStatus.CANCELLED:
-            raise HTTPException(
-                status_code=400,
-                detail="Card is cancelled and cannot be used."
-            )
+    # one clock read per request -> the expiry check and the row's created_at agree
+    now = datetime.utcnow()
 
-        # Check card expiry
-        if card.expiry_date < datetime.utcnow():
-            raise HTTPException(
-                status_code=400,
-                detail="Card has expired"
-            )
+    # Check card expiry
+    if card.expiry_date < now:
+        raise HTTPException(
+            status_code=400,
+            detail="Card has expired"
+        )
 
-        # Check spending limit
-        if card.spending_limit:
-            amount_decimal = Decimal(str(payment.amount))
-            if amount_decimal > card.spending_limit:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Payment exceeds card spending limit of {card.spending_limit}"
-                )
-
-        # Fetch account with row lock
-        account = db.execute(select(Account).filter(
-            Account.id == card.account_id
-        ).with_for_update()).scalar_one_or_none()
-
-        if not account:
-            raise HTTPException(status_code=404, detail="Account not found")
-
-        # Check account is active
-        if account.status != AccountStatus.ACTIVE:
+    # Check spending limit
+    if card.spending_limit_cents:
+        if amount_cents > card.spending_limit_cents:
             raise HTTPException(
                 status_code=400,
-                detail="Account is not active"
+                detail=f"Payment exceeds card spending limit of {card.spending_limit_cents / 100:.2f}"
             )
 
-        # Convert amount to Decimal
-        amount_decimal = Decimal(str(payment.amount))
+    # Check account is active
+    if card.account_status != AccountStatus.ACTIVE:
+        raise HTTPException(
+            status_code=400,
+            detail="Account is not active"
+        )
 
-        # Check sufficient balance
-        if account.balance < amount_decimal:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient funds. Available balance: {account.balance}"
-            )
+    # Check sufficient balance
+    if card.balance_cents < amount_cents:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient funds. Available balance: {card.balance_cents / 100:.2f}"
+        )
+
+    # Update account balance (card's account already checked to be the user's by the join above)
+    # guards stay in the WHERE -> the write is still atomic, the checks above just avoid it on rejection
+    account_id = _adjust_balance(
+        db, card.account_id, -amount_cents,
+        Account.balance_cents >= amount_cents
+    )
+
+    if account_id is None:
+        raise _balance_error(
+            db, card.account_id, current_user.id,
+            "You do not have permission to use this account"
+        )
 
+    try:
         # Create DEBIT transaction (card payment removes money)
-        transaction = Transaction(
-            account_id=account.id,
+        transaction = _insert_transaction(
+            db,
+            account_id=account_id,
+            user_id=current_user.id,
             type=TransactionDirection.DEBIT,
-            amount=amount_decimal,
+            amount_cents=amount_cents,
             description=payment.description or f"Card payment - {payment.merchant or 'Merchant'}",
             reference=None,
             category=TransactionCategory.CARD_PAYMENT,
-            card_id=card.id
+            card_id=card.id,
+            created_at=now
         )
 
-        db.add(transaction)
-        db.flush()
-
-        # Update account balance
-        account.balance -= amount_decimal
-
         db.commit()
-        db.refresh(transaction)
-
-        return transaction
-
-    except HTTPException:
-        db.rollback()
-        raise
     except IntegrityError:
-        db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Card payment failed: {str(e)}")
+
+    return transaction
 
 
 @router.get("", response_model=List[TransactionOut])
@@ -296,53 +303,80 @@ def get_transactions(
     end_date: Optional[datetime] = Query(None, description="Filter transactions until this date (ISO format)"),
     limit: int = Query(50, ge=1, le=100, description="Number of transactions to return"),
     offset: int = Query(0, ge=0, description="Number of transactions to skip"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    current_user: AuthUser = Depends(get_current_user),
+    db: Session = Depends(get_db_ro)
 ):
-    """Get transactions for the current user. Can filter by account_id, category, and date range."""
+    """
+    Get transactions for the current user. Can filter by account_id, category, and date range.
+    A full page sets X-Next-Cursor; pass it back as cursor to fetch the next one.
+    """
 
-    # Start with base query - only transactions from user's accounts
-    stmt = select(Transaction).join(Account).filter(
-        Account.user_id == current_user.id
-    )
+    # lambda statements -> the query tree is built and compiled once per filter combination,
+    # later calls only re-read the closure values as bound parameters
+    user_id = current_user.id
+
+    # Start with base query - only transactions from user's accounts (owner is stored on the row)
+    stmt = lambda_stmt(lambda: select(*_TX_OUT_COLUMNS).filter(
+        Transaction.user_id == user_id
+    ))
 
     # Apply filters
     if account_id:
-        # Verify account belongs to user
-        account = db.execute(select(Account).filter(
-            Account.id == account_id,
-            Account.user_id == current_user.id
-        )).scalar_one_or_none()
-
-        if not account:
-            raise HTTPException(
-                status_code=404,
-                detail="Account not found or you don't have access"
-            )
-
-        stmt = stmt.filter(Transaction.account_id == account_id)
+        # ownership is already enforced by user_id -> only check the account when nothing comes back
+        stmt += lambda s: s.filter(Transaction.account_id == account_id)
 
     if category:
-        try:
-            category_enum = TransactionCategory[category.upper()]
-            stmt = stmt.filter(Transaction.category == category_enum)
-        except KeyError:
+        category_enum = _CATEGORY_BY_NAME.get(category.upper())
+        if category_enum is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid category. Must be one of: {', '.join([c.value for c in TransactionCategory])}"
+                detail=f"Invalid category. Must be one of: {_CATEGORY_NAMES}"
             )
+        stmt += lambda s: s.filter(Transaction.category == category_enum)
 
     # Date range filtering
     if start_date:
-        stmt = stmt.filter(Transaction.created_at >= start_date)
+        stmt += lambda s: s.filter(Transaction.created_at >= start_date)
 
     if end_date:
-        stmt = stmt.filter(Transaction.created_at <= end_date)
+        stmt += lambda s: s.filter(Transaction.created_at <= end_date)
+
+    # keyset -> resume strictly after the last row served, an index range scan at any depth unlike offset
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        stmt += lambda s: s.filter(tuple_(Transaction.created_at, Transaction.id) < tuple_(
+            type_coerce(cursor_created_at, Transaction.created_at.type),
+            type_coerce(cursor_id, Transaction.id.type)
+        ))
+
+    # Order by most recent first, id breaks ties -> a stable order for the cursor; then paginate
+    stmt += lambda s: s.order_by(
+        Transaction.created_at.desc(), Transaction.id.desc()
+    ).offset(offset).limit(limit)
+
+    transactions = db.execute(stmt).all()
+
+    # empty page -> tell "not your account" (404) apart from "no matching transactions"
+    if account_id and not transactions:
+        owned = db.execute(select(Account.id).filter(
+            Account.id == account_id,
+            Account.user_id == current_user.id
+        )).first()
 
-    # Order by most recent first
-    stmt = stmt.order_by(Transaction.created_at.desc())
+        if owned is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Account not found or you don't have access"
+            )
 
-    # Apply pagination
-    transactions = db.execute(stmt.offset(offset).limit(limit)).scalars().all()
+    headers = {}
+    if len(transactions) == limit:
+        last = transactions[-1]
+        headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
 
-    return transactions
+    return Response(
+        content=orjson.dumps([TransactionOut.dict_from_row(row) for row in transactions]),
+        media_type="application/json",
+        headers=headers
+    )
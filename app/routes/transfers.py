@@ -1,216 +1,232 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from fastapi.responses import Response
+import orjson
+from sqlalchemy import and_, case, desc, exists, insert, or_, select, union_all, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from decimal import Decimal
 from uuid import UUID
-import uuid
 
-from ..database import get_db
-from ..models import Account, User, Transaction, TransactionDirection, AccountStatus, Transfer, TransactionCategory
-from ..schemas import TransferCreate, TransferOut
-from ..security import get_current_user
+from ..database import get_db, get_db_ro
+from ..models import Account, Transaction, TransactionDirection, AccountStatus, Transfer, TransactionCategory, uuid7
+from ..schemas import TransferCreate, TransferOut, to_cents
+from ..security import get_current_user_id
 from ..security import limiter
 
 
 router = APIRouter(prefix="/transfers", tags=["transfers"])
 
+# exactly the columns TransferOut reads -> reads never hydrate Transfer entities
+_TRANSFER_OUT_COLUMNS = (
+    Transfer.id,
+    Transfer.source_account_id,
+    Transfer.destination_account_id,
+    Transfer.amount_cents,
+    Transfer.description,
+    Transfer.created_at,
+    Transfer.source_transaction_id,
+    Transfer.destination_transaction_id
+)
+
+
+def _transfer_error(db: Session, transfer: TransferCreate, user_id: UUID) -> HTTPException:
+    """Cold path after the guarded transfer UPDATE matched fewer than both accounts -> which check failed."""
+    accounts = {
+        row.id: row
+        for row in db.execute(
+            select(Account.id, Account.user_id, Account.status, Account.balance_cents).where(
+                Account.id.in_((transfer.source_account_id, transfer.destination_account_id))
+            )
+        )
+    }
+    source = accounts.get(transfer.source_account_id)
+    destination = accounts.get(transfer.destination_account_id)
+
+    if source is None:
+        return HTTPException(status_code=404, detail="Source account not found")
+
+    if source.user_id != user_id:
+        return HTTPException(status_code=403, detail="You do not have permission to transfer from this account")
+
+    if source.status != AccountStatus.ACTIVE:
+        return HTTPException(status_code=400, detail="Source account is not active")
+
+    if destination is None:
+        return HTTPException(status_code=404, detail="Destination account not found")
+
+    if destination.status != AccountStatus.ACTIVE:
+        return HTTPException(status_code=400, detail="Destination account is not active")
+
+    # every other guard passed -> the source leg failed on funds, so its balance is still untouched
+    return HTTPException(
+        status_code=400,
+        detail=f"Insufficient funds. Available balance: {source.balance_cents / 100:.2f}"
+    )
+
 
 @router.post("", response_model=TransferOut, status_code=201)
 @limiter.limit("30/minute")
 def create_transfer(
     request: Request,
     transfer: TransferCreate,
-    current_user: User = Depends(get_current_user),
+    user_id: UUID = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """
     Create a transfer between two accounts.
     """
 
-    # validate that amount is positive
-    if transfer.amount <= 0:
-        raise HTTPException(status_code=400, detail="Amount must be positive")
-
-    # Validate source and destination are different
-    if transfer.source_account_id == transfer.destination_account_id:
-        raise HTTPException(
-            status_code=400,
-            detail="Source and destination accounts must be different"
-        )
-
-    # database transaction for atomicity
-    try:
-        # Fetch source account with row lock (concurrency)
-        source_account = db.execute(select(Account).filter(
-            Account.id == transfer.source_account_id
-        ).with_for_update()).scalar_one_or_none()
-
-        if not source_account:
-            raise HTTPException(status_code=404, detail="Source account not found")
-
-        # Verify source account belongs to current user
-        if source_account.user_id != current_user.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You do not have permission to transfer from this account"
+    # amount > 0 and source != destination are enforced by TransferCreate -> only db-dependent checks remain
+
+    amount_cents = to_cents(transfer.amount)
+
+    # one db transaction for atomicity -> get_db rolls it back if anything below raises
+    # check and move both balances in one guarded UPDATE -> no locking SELECT up front;
+    # the source must be the user's, active and funded, the destination active
+    moved = db.execute(
+        update(Account)
+        .where(or_(
+            and_(
+                Account.id == transfer.source_account_id,
+                Account.user_id == user_id,
+                Account.status == AccountStatus.ACTIVE,
+                Account.balance_cents >= amount_cents
+            ),
+            and_(
+                Account.id == transfer.destination_account_id,
+                Account.status == AccountStatus.ACTIVE
             )
+        ))
+        .values(balance_cents=Account.balance_cents + case(
+            (Account.id == transfer.source_account_id, -amount_cents),
+            else_=amount_cents
+        ))
+        .returning(Account.id, Account.user_id)
+        .execution_options(synchronize_session=False)
+    ).all()
 
-        # Check source account is active
-        if source_account.status != AccountStatus.ACTIVE:
-            raise HTTPException(
-                status_code=400,
-                detail="Source account is not active"
-            )
-
-        # Fetch destination account with row lock
-        destination_account = db.execute(select(Account).filter(
-            Account.id == transfer.destination_account_id
-        ).with_for_update()).scalar_one_or_none()
-
-        if not destination_account:
-            raise HTTPException(status_code=404, detail="Destination account not found")
-
-        # Check destination account is active
-        if destination_account.status != AccountStatus.ACTIVE:
-            raise HTTPException(
-                status_code=400,
-                detail="Destination account is not active"
-            )
+    if len(moved) != 2:
+        raise _transfer_error(db, transfer, user_id)
 
+    destination_user_id = next(row.user_id for row in moved if row.id == transfer.destination_account_id)
 
+    # Generate transfer reference
+    transfer_id = uuid7()
+    # v7 ids lead with the timestamp -> take the reference from the random tail so it stays distinct
+    transfer_ref = f"TRF-{transfer_id.hex[-8:]}"
 
-        # Check sufficient balance
-        amount_decimal = Decimal(str(transfer.amount))
-        if source_account.balance < amount_decimal:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient funds. Available balance: {source_account.balance}"
-            )
-
-        # Generate transfer reference
-        transfer_id = uuid.uuid4()
-        transfer_ref = f"TRF-{str(transfer_id)[:8]}"
-
-        # Create DEBIT transaction for source account
-        debit_transaction = Transaction(
-            account_id=source_account.id,
-            type=TransactionDirection.DEBIT,
-            amount=amount_decimal,
-            description=transfer.description or f"Transfer to account {destination_account.id}",
-            reference=transfer_ref,
-            category=TransactionCategory.TRANSFER,
-            transfer_id=transfer_id
-        )
-
-        # add debit transaction to session
-        db.add(debit_transaction)
-        db.flush()
-
-        # Create CREDIT transaction for destination account
-        credit_transaction = Transaction(
-            account_id=destination_account.id,
-            type=TransactionDirection.CREDIT,
-            amount=amount_decimal,
-            description=transfer.description or f"Transfer from account {source_account.id}",
-            reference=transfer_ref,
-            category=TransactionCategory.TRANSFER,
-            transfer_id=transfer_id
-        )
-        # add credit transaction to session
-        db.add(credit_transaction)
-        db.flush()
-
-        # Update account balances atomically
-        source_account.balance -= amount_decimal
-        destination_account.balance += amount_decimal
-
-        # Create transfer record
-        db_transfer = Transfer(
+    try:
+        # both legs in one multi-row INSERT -> ids are minted here instead of read back per row
+        debit_transaction_id = uuid7()
+        credit_transaction_id = uuid7()
+        db.execute(insert(Transaction), [
+            # DEBIT transaction for source account
+            dict(
+                id=debit_transaction_id,
+                account_id=transfer.source_account_id,
+                user_id=user_id,
+                type=TransactionDirection.DEBIT,
+                amount_cents=amount_cents,
+                description=transfer.description or f"Transfer to account {transfer.destination_account_id}",
+                reference=transfer_ref,
+                category=TransactionCategory.TRANSFER,
+                transfer_id=transfer_id
+            ),
+            # CREDIT transaction for destination account
+            dict(
+                id=credit_transaction_id,
+                account_id=transfer.destination_account_id,
+                user_id=destination_user_id,
+                type=TransactionDirection.CREDIT,
+                amount_cents=amount_cents,
+                description=transfer.description or f"Transfer from account {transfer.source_account_id}",
+                reference=transfer_ref,
+                category=TransactionCategory.TRANSFER,
+                transfer_id=transfer_id
+            ),
+        ])
+
+        # Create transfer record (INSERT ... RETURNING -> no flush, no refresh SELECT after commit)
+        db_transfer = db.execute(insert(Transfer).values(
             id=transfer_id,
-            source_account_id=source_account.id,
-            destination_account_id=destination_account.id,
-            amount=amount_decimal,
+            source_account_id=transfer.source_account_id,
+            destination_account_id=transfer.destination_account_id,
+            amount_cents=amount_cents,
             description=transfer.description,
-            source_transaction_id=debit_transaction.id,
-            destination_transaction_id=credit_transaction.id
-        )
-        db.add(db_transfer)
+            source_transaction_id=debit_transaction_id,
+            destination_transaction_id=credit_transaction_id
+        ).returning(Transfer)).scalar_one()
 
         # Commit all changes
         db.commit()
-        db.refresh(db_transfer)
-
-        return TransferOut(
-            id=db_transfer.id,
-            source_account_id=db_transfer.source_account_id,
-            destination_account_id=db_transfer.destination_account_id,
-            amount=float(db_transfer.amount),
-            description=db_transfer.description,
-            created_at=db_transfer.created_at,
-            source_transaction_id=db_transfer.source_transaction_id,
-            destination_transaction_id=db_transfer.destination_transaction_id
-        )
-
-    except HTTPException:
-        db.rollback()
-        raise
-    except IntegrityError as e:
-        db.rollback()
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Database integrity error")
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
-    
 
-    
+    return Response(
+        content=orjson.dumps(TransferOut.dict_from_row(db_transfer)),
+        status_code=201,
+        media_type="application/json"
+    )
+
+
 @router.get("", response_model=List[TransferOut])
 @limiter.limit("100/minute")
 def get_transfers(
     request: Request,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_db_ro)
 ):
     """
     Retrieve all transfers involving the current user.
     """
-    # We join with the Account model to filter by the user_id of the owners
-    transfers = db.execute(select(Transfer).join(
-        Account,
-        (Transfer.source_account_id == Account.id) | (Transfer.destination_account_id == Account.id)
-    ).filter(
-        Account.user_id == current_user.id
-    ).distinct().offset(skip).limit(limit)).scalars().all()
-
-    return transfers
+    # sent and received as two disjoint IN lookups glued with UNION ALL -> no OR-join, no DISTINCT sort;
+    # transfers between the user's own accounts only match the first branch
+    owned_account_ids = select(Account.id).filter(Account.user_id == user_id)
+    sent = select(*_TRANSFER_OUT_COLUMNS).filter(Transfer.source_account_id.in_(owned_account_ids))
+    received = select(*_TRANSFER_OUT_COLUMNS).filter(
+        Transfer.destination_account_id.in_(owned_account_ids),
+        Transfer.source_account_id.not_in(owned_account_ids)
+    )
+    # newest first, id breaks ties -> a stable order, so skip/limit pages don't overlap or drop rows
+    transfers = db.execute(
+        union_all(sent, received).order_by(desc("created_at"), desc("id")).offset(skip).limit(limit)
+    )
+
+    return Response(
+        content=orjson.dumps([TransferOut.dict_from_row(row) for row in transfers]),
+        media_type="application/json"
+    )
 
 @router.get("/{transfer_id}", response_model=TransferOut)
 @limiter.limit("100/minute")
 def get_transfer_by_id(
     request: Request,
     transfer_id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user_id: UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_db_ro)
 ):
     """
     Get details for a specific transfer.
     """
-    transfer = db.execute(select(Transfer).filter(Transfer.id == transfer_id)).scalar_one_or_none()
-
-    if not transfer:
+    # ownership checked server-side in the same round trip -> no Account rows are loaded
+    owned = exists().where(
+        Account.id.in_((Transfer.source_account_id, Transfer.destination_account_id)),
+        Account.user_id == user_id
+    )
+    row = db.execute(
+        select(*_TRANSFER_OUT_COLUMNS, owned.label("owned")).filter(Transfer.id == transfer_id)
+    ).one_or_none()
+
+    if not row:
         raise HTTPException(status_code=404, detail="Transfer not found")
 
     # Security check: Ensure the user owns one of the accounts involved
-    source_acc = db.execute(select(Account).filter(Account.id == transfer.source_account_id)).scalar_one_or_none()
-    dest_acc = db.execute(select(Account).filter(Account.id == transfer.destination_account_id)).scalar_one_or_none()
-
-    if source_acc.user_id != current_user.id and dest_acc.user_id != current_user.id:
+    if not row.owned:
         raise HTTPException(
             status_code=403, 
             detail="You do not have permission to view this transfer"
         )
 
-    return transfer
\ No newline at end of file
+    return Response(content=orjson.dumps(TransferOut.dict_from_row(row)), media_type="application/json")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import datetime
+from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 import re
@@ -9,6 +10,19 @@ from .models import AccountType, CardType, AccountStatus, CardStatus, Transactio
 Pydantic models for the banking application.
 These models are used for request data validation and response serialization."""
 
+
+# validator patterns compiled once at import
+_UPPER = re.compile(r'[A-Z]')
+_LOWER = re.compile(r'[a-z]')
+_DIGIT = re.compile(r'\d')
+_CARD_HOLDER_NAME = re.compile(r'^[A-Za-z\s\-\.]+$')
+
+
+def to_cents(amount: Decimal) -> int:
+    """Convert a validated (max 2 decimal places) API amount to integer cents."""
+    return round(amount * 100)
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str = Field(
@@ -21,11 +35,11 @@ class UserCreate(BaseModel):
     @field_validator('password')
     @classmethod
     def validate_password_strength(cls, v):
-        if not re.search(r'[A-Z]', v):
+        if not _UPPER.search(v):
             raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
+        if not _LOWER.search(v):
             raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
+        if not _DIGIT.search(v):
             raise ValueError('Password must contain at least one digit')
         return v
 
@@ -73,6 +87,22 @@ class TransactionOut(BaseModel):
     transfer_id: Optional[UUID]
     card_id: Optional[UUID]
 
+    @staticmethod
+    def dict_from_row(row) -> dict:
+        """JSON-ready dict straight from a Core row -> hot list paths skip ORM and model construction."""
+        return {
+            "id": row.id,
+            "account_id": row.account_id,
+            "type": row.type.value,
+            "amount": row.amount_cents / 100,
+            "description": row.description,
+            "reference": row.reference,
+            "created_at": row.created_at,
+            "category": row.category.value,
+            "transfer_id": row.transfer_id,
+            "card_id": row.card_id
+        }
+
     class Config:
         from_attributes = True
 
@@ -80,21 +110,14 @@ class TransactionOut(BaseModel):
 class TransferCreate(BaseModel):
     source_account_id: UUID
     destination_account_id: UUID
-    amount: float = Field(
+    amount: Decimal = Field(
         gt=0,
+        decimal_places=2,
         le=1000000,
         description="Transfer amount must be positive and not exceed $1,000,000"
     )
     description: Optional[str] = Field(None, max_length=500)
 
-    # valute amount (must have at most 2 decimal places)
-    @field_validator('amount')
-    @classmethod
-    def validate_decimal_places(cls, v):
-        if round(v, 2) != v:
-            raise ValueError('Amount must have at most 2 decimal places')
-        return v
-
     # validate that source and destination accounts are different
     @field_validator('destination_account_id')
     @classmethod
@@ -114,42 +137,43 @@ class TransferOut(BaseModel):
     source_transaction_id: UUID
     destination_transaction_id: UUID
 
+    @staticmethod
+    def dict_from_row(row) -> dict:
+        """JSON-ready dict from a transfer row -> trusted db values skip model validation."""
+        return {
+            "id": row.id,
+            "source_account_id": row.source_account_id,
+            "destination_account_id": row.destination_account_id,
+            "amount": row.amount_cents / 100,
+            "description": row.description,
+            "created_at": row.created_at,
+            "source_transaction_id": row.source_transaction_id,
+            "destination_transaction_id": row.destination_transaction_id
+        }
+
 
 class DepositCreate(BaseModel):
     account_id: UUID
-    amount: float = Field(
+    # Decimal -> parsed exactly from the JSON number; the 2-place limit is checked by the field itself
+    amount: Decimal = Field(
         gt=0,
+        decimal_places=2,
         le=100000,
         description="Deposit amount must be positive and not exceed $100,000"
     )
     description: Optional[str] = Field(None, max_length=500)
 
-    # validate amount (must have at most 2 decimal places)
-    @field_validator('amount')
-    @classmethod
-    def validate_decimal_places(cls, v):
-        if round(v, 2) != v:
-            raise ValueError('Amount must have at most 2 decimal places')
-        return v
-
 
 class WithdrawalCreate(BaseModel):
     account_id: UUID
-    amount: float = Field(
+    amount: Decimal = Field(
         gt=0,
+        decimal_places=2,
         le=50000,
         description="Withdrawal amount must be positive and not exceed $50,000"
     )
     description: Optional[str] = Field(None, max_length=500)
 
-    # validate amount (must have at most 2 decimal places)
-    @field_validator('amount')
-    @classmethod
-    def validate_decimal_places(cls, v):
-        if round(v, 2) != v:
-            raise ValueError('Amount must have at most 2 decimal places')
-        return v
-
 
 class CardCreate(BaseModel):
     account_id: UUID
@@ -171,27 +195,18 @@ class CardCreate(BaseModel):
     )
 
 
-    # enforce optional spending limit between 0 and 50,000
-    spending_limit: Optional[float] = Field(None, gt=0, le=50000)
+    # enforce optional spending limit between 0 and 50,000, at most 2 decimal places
+    spending_limit: Optional[Decimal] = Field(None, gt=0, le=50000, decimal_places=2)
 
     @field_validator('card_holder_name')
     @classmethod
     def validate_card_holder_name(cls, v):
         # Only allow letters, spaces, hyphens, and periods
-        if not re.match(r'^[A-Za-z\s\-\.]+$', v):
+        if not _CARD_HOLDER_NAME.match(v):
             raise ValueError('Card holder name can only contain letters, spaces, hyphens, and periods')
         return v.strip()
 
 
-    # enforce spending limit to have at most 2 decimal places
-    @field_validator('spending_limit')
-    @classmethod
-    def validate_decimal_places(cls, v):
-        if v is not None and round(v, 2) != v:
-            raise ValueError('Spending limit must have at most 2 decimal places')
-        return v
-
-
 class CardOut(BaseModel):
     id: UUID
     account_id: UUID
@@ -219,6 +234,21 @@ class CardOut(BaseModel):
             created_at=card.created_at
         )
 
+    @classmethod
+    def from_row(cls, row):
+        """CardOut from a Core row carrying last4 -> the full card number never leaves the db."""
+        return cls(
+            id=row.id,
+            account_id=row.account_id,
+            card_number_masked=f"****-****-****-{row.last4}",
+            card_holder_name=row.card_holder_name,
+            expiry_date=row.expiry_date,
+            card_type=row.card_type,
+            status=row.status,
+            spending_limit=None if row.spending_limit_cents is None else row.spending_limit_cents / 100,
+            created_at=row.created_at
+        )
+
     class Config:
         from_attributes = True
 
@@ -246,18 +276,11 @@ class CardPaymentCreate(BaseModel):
     card_id: UUID
     
     # enforce amount between 0 and 10,000
-    amount: float = Field(
+    amount: Decimal = Field(
         gt=0,
+        decimal_places=2,
         le=10000,
         description="Payment amount must be positive and not exceed $10,000"
     )
     description: Optional[str] = Field(None, max_length=500)
     merchant: Optional[str] = Field(None, max_length=100)
-
-    # enforce amount to have at most 2 decimal places
-    @field_validator('amount')
-    @classmethod
-    def validate_decimal_places(cls, v):
-        if round(v, 2) != v:
-            raise ValueError('Amount must have at most 2 decimal places')
-        return v
@@ -1,20 +1,43 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+import jwt
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
+from typing import Optional
 from uuid import UUID
+from dataclasses import dataclass
+import threading
+import time
+from cachetools import TLRUCache
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 
-from .database import get_db
-from .models import User
+from .database import get_db_ro
+from .models import User, RoleType
 load_dotenv()
 
+
+def _rate_limit_key(request: Request) -> str:
+    # AuthMiddleware already decoded the token -> limit per user, fall back to client IP
+    user = getattr(request.state, "user", None)
+    return str(user.id) if user is not None else get_remote_address(request)
+
+
 # Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# per-process memory by default; point RATE_LIMIT_STORAGE_URI at redis://... so every worker shares one counter
+limiter = Limiter(
+    key_func=_rate_limit_key,
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://"),
+    strategy=os.getenv("RATE_LIMIT_STRATEGY", "fixed-window"),
+    # per-client cap across every route, checked by the middleware -> floods stop before routing and auth
+    application_limits=[os.getenv("RATE_LIMIT_GLOBAL", "200/minute")],
+    # redis unreachable -> count in process memory until it is back instead of failing every request
+    in_memory_fallback_enabled=True,
+    key_prefix="bank"
+)
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
@@ -23,32 +46,85 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+@dataclass(frozen=True, slots=True)
+class AuthUser:
+    """Identity carried by a signed access token -> no DB lookup needed to build it."""
+    id: UUID
+    email: str
+    role: RoleType
+    token_version: int
+
+
+# valid tokens only, keyed by the raw token -> repeat requests skip the signature check;
+# entries live until the token's own exp, capped at _DECODE_CACHE_TTL seconds
+_DECODE_CACHE_TTL = 60
+_DECODE_CACHE = TLRUCache(
+    maxsize=50_000,
+    ttu=lambda token, entry, now: min(now + _DECODE_CACHE_TTL, entry[1]),
+    timer=time.time
+)
+_DECODE_CACHE_LOCK = threading.Lock()
+
+
+def decode_access_token(token: str) -> Optional[AuthUser]:
+    """Decode a bearer token into an AuthUser, or None if it is invalid/expired."""
+    with _DECODE_CACHE_LOCK:
+        entry = _DECODE_CACHE.get(token)
+    if entry is not None:
+        return entry[0]
+
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        user = AuthUser(
+            id=UUID(payload["sub"]),
+            email=payload["email"],
+            role=RoleType(payload["role"]),
+            token_version=payload["ver"]
+        )
+    # tokens issued before the claim set was extended are missing keys -> also invalid
+    except (jwt.InvalidTokenError, KeyError, ValueError):
+        return None
+
+    if "exp" in payload:
+        with _DECODE_CACHE_LOCK:
+            _DECODE_CACHE[token] = (user, payload["exp"])
+    return user
+
+
 def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: Session = Depends(get_db_ro)
+) -> AuthUser:
     """Get and validate the current user from the JWT token """
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
+    # decoded once per request by AuthMiddleware; decode here only if it didn't run
+    user = getattr(request.state, "user", None) or decode_access_token(token)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.get(User, UUID(user_id))
-    if not user:
+    # identity comes from the signed claims; only the live version is read -> one primary-key lookup
+    token_version = db.execute(
+        select(User.token_version).filter(User.id == user.id)
+    ).scalar_one_or_none()
+    if token_version is None:
         raise HTTPException(status_code=401, detail="User not found")
 
+    # bumping users.token_version (logout) revokes every token issued before it
+    if token_version != user.token_version:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+
     return user
 
 
+def get_current_user_id(current_user: AuthUser = Depends(get_current_user)) -> UUID:
+    """Just the caller's id, for routes that scope queries by owner and need nothing else."""
+    return current_user.id
+
+
 def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """Get and validate that the current user is an admin."""
-    from .models import RoleType
-
     if current_user.role != RoleType.ADMIN:
         raise HTTPException(
             status_code=403,
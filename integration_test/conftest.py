@@ -1,67 +1,147 @@
+import itertools
 import os
 import sys
 import uuid
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, select
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from starlette.routing import Match
 
 # allow for import to app
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# bcrypt's minimum cost for test users -> hashing is ~250x cheaper; read by app.routes.auth at import
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 from app.main import app
-from app.database import Base, get_db
+from app.middleware import _flatten_routes
+from app.security import get_current_user
+from app.database import Base, get_db, get_db_ro
+from app.models import Account, AccountType, Card, CardType, Transaction, TransactionCategory, TransactionDirection, User
+from app.routes.cards import generate_card_number, hash_pin
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # In-memory database for test isolation
-DB_URL = "sqlite:///:memory:"
+# named shared-cache URI -> any connection opened on it sees the same tables, not a fresh empty db
+# one name per pytest-xdist worker ("main" when run serially) -> workers never share a database
+DB_URL = f"sqlite:///file:testdb_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}?mode=memory&cache=shared&uri=true"
 
 
+# StaticPool keeps its one connection open for the whole run -> the in-memory db lives as long as the suite
 engine = create_engine(
     DB_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-@pytest.fixture(scope="function")
-def db_session():
-    """Create a fresh database for each test."""
-    # Create tables
+
+# pysqlite's own transaction handling breaks SAVEPOINTs -> let SQLAlchemy emit BEGIN itself
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_begin(dbapi_conn, connection_record):
+    dbapi_conn.isolation_level = None
+
+
+# throwaway database -> no durability: skip syncs, keep the rollback journal in memory, never share the lock
+@event.listens_for(engine, "connect")
+def _set_test_pragma(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+    cursor.close()
+
+
+@event.listens_for(engine, "begin")
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+# same as the app's SessionLocal -> committed objects aren't re-SELECTed on their next access
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+@pytest.fixture(scope="session")
+def tables():
+    """Create the schema once for the whole run."""
     Base.metadata.create_all(bind=engine)
 
 
-    session = TestingSessionLocal()
+def _session_on(connection):
+    # the app's commits and rollbacks only release / roll back a SAVEPOINT inside the connection's transaction
+    return TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+
+
+@pytest.fixture(scope="module")
+def _module_connection(tables):
+    """One outer transaction per test module, rolled back once the module is done."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture(scope="function")
+def db_session(_module_connection):
+    """Run each test inside a SAVEPOINT of the module transaction, rolled back afterwards."""
+    savepoint = _module_connection.begin_nested()
+    session = _session_on(_module_connection)
     try:
         yield session
     finally:
         session.close()
-        # drop tables
-        Base.metadata.drop_all(bind=engine)
+        savepoint.rollback()
 
-@pytest.fixture(scope="function")
-def client(db_session):
-    """Create a test client that uses the override_db dependency."""
+# session the running test's requests should use -> read by the db override installed once below
+_current_session = ContextVar("current_session")
+
+
+@pytest.fixture(scope="session")
+def _test_client(tables):
+    """One TestClient (and lifespan run) for the whole suite."""
     def override_get_db():
+        session = _current_session.get()
         try:
-            yield db_session
+            yield session
+        # same as get_db -> a route that raises leaves nothing half-written in the test's savepoint
+        except Exception:
+            session.rollback()
+            raise
         finally:
-            db_session.close()
+            # nothing expires on commit -> start every request from an empty identity map, like a fresh session
+            session.expunge_all()
 
     # db override
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_ro] = override_get_db
 
     # Disable rate limiting for tests
     app.state.limiter.enabled = False
 
     # test client
     with TestClient(app) as test_client:
+        # one-time costs (openapi/schema build, middleware stack, auth path) land here, not in the first test
+        with engine.connect() as connection:
+            session = _session_on(connection)
+            token = _current_session.set(session)
+            try:
+                test_client.get("/openapi.json")
+                test_client.get("/auth/me", headers={"Authorization": "Bearer warmup"})
+            finally:
+                _current_session.reset(token)
+                session.close()
         yield test_client
 
     # clear overrides
@@ -69,23 +149,65 @@ def client(db_session):
     app.state.limiter.enabled = True
 
 
-@pytest.fixture
-def user_data():
-    """Generates a unique email and password for each test run."""
-    random_id = str(uuid.uuid4())[:8]
-    return {
-        "email": f"test_{random_id}@gmail.com",
-        "password": "password2"
-    }
+@pytest.fixture(scope="function")
+def client(_test_client, db_session):
+    """The shared test client, pointed at this test's rolled-back session."""
+    token = _current_session.set(db_session)
+    yield _test_client
+    _current_session.reset(token)
 
 
 @pytest.fixture
-def authenticated_client(client, user_data):
+def rate_limited(_test_client):
+    """Turn the limiter back on for one test, with every counter reset before and after."""
+    limiter = app.state.limiter
+    limiter.reset()
+    limiter.enabled = True
+    yield limiter
+    limiter.enabled = False
+    limiter.reset()
+
+
+def _depends_on(dependant, call):
+    return any(d.call is call or _depends_on(d, call) for d in dependant.dependencies)
+
+
+@pytest.fixture(scope="session")
+def route_requires_auth():
     """
-    Returns a tuple of (client, headers, user_data) with a valid auth token.
-    Handles signup and login automatically for tests that need authentication.
-    Can be used across all test files.
+    Checks that the route serving (method, path) resolves get_current_user somewhere in its dependencies.
+    No request is sent -> covers every route cheaply, on top of each module's real 401 requests.
     """
+    routes = list(_flatten_routes(app.routes))
+
+    def check(method, path):
+        scope = {"type": "http", "method": method, "path": path}
+        route = next(r for r in routes if r.matches(scope)[0] == Match.FULL)
+        return _depends_on(route.dependant, get_current_user)
+
+    return check
+
+
+# (headers, expected body) for requests that must be rejected -> no token, and one AuthMiddleware can't decode
+UNAUTHENTICATED = [
+    ({}, {"detail": "Not authenticated"}),
+    ({"Authorization": "Bearer not-a-jwt"}, {"detail": "Invalid token"}),
+]
+
+
+# each xdist worker has its own database -> a per-process counter is enough to keep emails unique
+_user_ids = itertools.count()
+
+
+def _new_user_data():
+    return {
+        "email": f"test_{next(_user_ids)}@gmail.com",
+        "password": "Password2"
+    }
+
+
+def _sign_up_and_log_in(client, user_data):
+    """Sign up and log in through the API -> auth headers for the new user."""
     # Sign up
     signup_response = client.post("/auth/signup", json=user_data)
     assert signup_response.status_code in [200, 201], \
@@ -98,9 +220,117 @@ def authenticated_client(client, user_data):
 
     token = login_response.json()["access_token"]
 
-    headers = {
+    return {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
 
+
+@pytest.fixture
+def user_data():
+    """Generates a unique email and password for each test run."""
+    return _new_user_data()
+
+
+@pytest.fixture(scope="module")
+def _module_user(_test_client, _module_connection):
+    """
+    One signed-up user per test module -> signup/login (and their bcrypt work) run once per module.
+    The user lives in the module transaction, so each test's rollback leaves it in place.
+    """
+    session = _session_on(_module_connection)
+    token = _current_session.set(session)
+    try:
+        user_data = _new_user_data()
+        headers = _sign_up_and_log_in(_test_client, user_data)
+    finally:
+        _current_session.reset(token)
+        session.close()
+    return headers, user_data
+
+
+@pytest.fixture
+def authenticated_client(client, _module_user):
+    """
+    Returns a tuple of (client, headers, user_data) with a valid auth token.
+    The user is shared by every test in the module; anything a test creates is rolled back.
+    Can be used across all test files.
+    """
+    headers, user_data = _module_user
     return client, headers, user_data
+
+
+@pytest.fixture
+def fresh_authenticated_client(client, user_data):
+    """Like authenticated_client, but with a new user for tests that change the user itself."""
+    return client, _sign_up_and_log_in(client, user_data), user_data
+
+
+@pytest.fixture
+def make_accounts(db_session, _module_user):
+    """
+    Factory for the module user's accounts, inserted straight into the test's session -> list of ids.
+    Setup-only; POST /accounts keeps its own end-to-end test.
+    """
+    _, user_data = _module_user
+    user_id = db_session.execute(select(User.id).filter(User.email == user_data["email"])).scalar_one()
+
+    def make(n=1, type="CHECKING", balance=0.0):
+        accounts = [
+            Account(user_id=user_id, type=AccountType(type), balance_cents=round(balance * 100))
+            for _ in range(n)
+        ]
+        # one commit -> a single multi-row INSERT, kept even if a later request in the test rolls back
+        db_session.add_all(accounts)
+        db_session.commit()
+        return [str(account.id) for account in accounts]
+
+    return make
+
+
+@pytest.fixture
+def make_card(db_session):
+    """Factory for an active card on one of the user's accounts -> its id. POST /cards is tested separately."""
+    def make(account_id, card_type="DEBIT", card_holder_name="Test User", pin="1111", spending_limit=None):
+        account_id = uuid.UUID(account_id)
+        card = Card(
+            account_id=account_id,
+            card_number=generate_card_number(),
+            card_holder_name=card_holder_name,
+            pin_hash=hash_pin(account_id, pin),
+            card_type=CardType(card_type),
+            expiry_date=datetime.utcnow() + timedelta(days=365 * 3),
+            spending_limit_cents=None if spending_limit is None else round(spending_limit * 100)
+        )
+        db_session.add(card)
+        db_session.commit()
+        return str(card.id)
+
+    return make
+
+
+@pytest.fixture
+def make_transactions(db_session):
+    """
+    Factory for history rows on an account -> their ids, in the order given.
+    entries are (type, amount, created_at) tuples; balances are left alone, reads never recompute them.
+    """
+    def make(account_id, entries, category="DEPOSIT"):
+        account_id = uuid.UUID(account_id)
+        user_id = db_session.execute(select(Account.user_id).filter(Account.id == account_id)).scalar_one()
+        transactions = [
+            Transaction(
+                account_id=account_id,
+                user_id=user_id,
+                type=TransactionDirection(type),
+                amount_cents=round(amount * 100),
+                category=TransactionCategory(category),
+                created_at=created_at
+            )
+            for type, amount, created_at in entries
+        ]
+        db_session.add_all(transactions)
+        db_session.commit()
+        return [str(transaction.id) for transaction in transactions]
+
+    return make
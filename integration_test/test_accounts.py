@@ -1,4 +1,8 @@
 import pytest
+import uuid
+from datetime import datetime, timedelta
+
+from conftest import UNAUTHENTICATED
 
 
 # ========== AUTHENTICATED TESTS ==========
@@ -22,13 +26,13 @@ def test_create_account_authenticated(authenticated_client):
     assert "id" in account
 
 
-def test_get_accounts_authenticated(authenticated_client):
+def test_get_accounts_authenticated(authenticated_client, make_accounts):
     """Test getting accounts list with valid authentication."""
     client, headers, user_data = authenticated_client
 
     # Create one of each account type
-    client.post("/accounts", headers=headers, json={"type": "CHECKING"})
-    client.post("/accounts", headers=headers, json={"type": "SAVINGS"})
+    make_accounts(type="CHECKING")
+    make_accounts(type="SAVINGS")
 
     # Get all accounts
     response = client.get("/accounts", headers=headers)
@@ -41,13 +45,12 @@ def test_get_accounts_authenticated(authenticated_client):
     assert accounts[1]["type"] in ["CHECKING", "SAVINGS"]
 
 
-def test_get_specific_account_authenticated(authenticated_client):
+def test_get_specific_account_authenticated(authenticated_client, make_accounts):
     """Test getting a specific account by ID with valid authentication."""
     client, headers, user_data = authenticated_client
 
     # Create an account
-    create_response = client.post("/accounts", headers=headers, json={"type": "CHECKING"})
-    account_id = create_response.json()["id"]
+    [account_id] = make_accounts()
 
     # Get the specific account
     response = client.get(f"/accounts/{account_id}", headers=headers)
@@ -59,13 +62,12 @@ def test_get_specific_account_authenticated(authenticated_client):
     assert account["type"] == "CHECKING"
 
 
-def test_get_account_transactions_authenticated(authenticated_client):
+def test_get_account_transactions_authenticated(authenticated_client, make_accounts):
     """Test getting transactions for an account with valid authentication."""
     client, headers, user_data = authenticated_client
 
     # Create an account
-    create_response = client.post("/accounts", headers=headers, json={"type": "CHECKING"})
-    account_id = create_response.json()["id"]
+    [account_id] = make_accounts()
 
     # Get transactions (should be empty)
     response = client.get(f"/accounts/{account_id}/transactions", headers=headers)
@@ -76,76 +78,153 @@ def test_get_account_transactions_authenticated(authenticated_client):
     assert isinstance(transactions, list)
 
 
-# ========== UNAUTHENTICATED TESTS ==========
-
-def test_create_account_unauthenticated(client):
-    """Test that creating an account without auth returns 401."""
-    account_data = {
-        "type": "CHECKING"
-    }
-
-    response = client.post("/accounts", json=account_data)
-
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
-
-
-def test_get_accounts_unauthenticated(client):
-    """Test that getting accounts without auth returns 401."""
-    response = client.get("/accounts")
-
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
-
-
-def test_get_specific_account_unauthenticated(client):
-    """Test that getting a specific account without auth returns 401."""
-
-    # Use a fake UUID
-    fake_id = "00000000-0000-0000-0000-000000000000"
-
-    response = client.get(f"/accounts/{fake_id}")
+# history is streamed 500 rows per batch -> enough rows for two full batches and a one-row tail
+HISTORY_ROWS = 1001
 
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
 
+@pytest.fixture
+def long_history(make_accounts, make_transactions):
+    """An account with HISTORY_ROWS transactions one minute apart -> (account id, ids newest first)."""
+    [account_id] = make_accounts()
+    start = datetime(2024, 1, 1)
+    ids = make_transactions(account_id, [
+        ("CREDIT", 1.0, start + timedelta(minutes=i)) for i in range(HISTORY_ROWS)
+    ])
+    return account_id, ids[::-1]
 
-def test_get_account_transactions_unauthenticated(client):
-    """Test that getting account transactions without auth returns 401."""
-    # Use a fake UUID
-    fake_id = "00000000-0000-0000-0000-000000000000"
 
-    response = client.get(f"/accounts/{fake_id}/transactions")
+def test_account_transactions_streams_every_batch(authenticated_client, long_history):
+    """Test that a history longer than one batch decodes as one array, newest first, with every row once."""
+    client, headers, _ = authenticated_client
+    account_id, ids = long_history
 
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
+    response = client.get(f"/accounts/{account_id}/transactions", headers=headers)
+    assert response.status_code == 200
+    assert [t["id"] for t in response.json()] == ids
 
 
-def test_freeze_account_unauthenticated(client):
-    """Test that freezing an account without auth returns 401."""
-    fake_id = "00000000-0000-0000-0000-000000000000"
+@pytest.mark.parametrize("limit,offset", [(100, 450), (1000, 0), (1000, 1), (10, 1000), (10, HISTORY_ROWS)])
+def test_account_transactions_limit_offset(authenticated_client, long_history, limit, offset):
+    """Test that limit/offset slice the streamed history, including across a batch boundary."""
+    client, headers, _ = authenticated_client
+    account_id, ids = long_history
 
-    response = client.patch(f"/accounts/{fake_id}/freeze")
+    response = client.get(
+        f"/accounts/{account_id}/transactions",
+        headers=headers,
+        params={"limit": limit, "offset": offset}
+    )
+    assert response.status_code == 200
+    assert [t["id"] for t in response.json()] == ids[offset:offset + limit]
 
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
 
+def test_account_transactions_empty(authenticated_client, make_accounts):
+    """Test that an account with no history streams an empty JSON array."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts()
 
-def test_unfreeze_account_unauthenticated(client):
-    """Test that unfreezing an account without auth returns 401."""
-    fake_id = "00000000-0000-0000-0000-000000000000"
+    response = client.get(f"/accounts/{account_id}/transactions", headers=headers)
+    assert response.status_code == 200
+    assert response.content == b"[]"
+
+
+# (balance, actions taken first, action under test, resulting status)
+@pytest.mark.parametrize("balance,setup,action,status", [
+    (0.0, [], "freeze", "FROZEN"),
+    (0.0, ["freeze"], "unfreeze", "ACTIVE"),
+    (0.0, [], "close", "CLOSED"),
+    (0.0, ["freeze"], "close", "CLOSED"),
+])
+def test_account_status_transition(authenticated_client, make_accounts, balance, setup, action, status):
+    """Test each allowed freeze / unfreeze / close transition."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=balance)
+    for step in setup:
+        assert client.patch(f"/accounts/{account_id}/{step}", headers=headers).status_code == 200
+
+    response = client.patch(f"/accounts/{account_id}/{action}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == status
+    assert client.get(f"/accounts/{account_id}", headers=headers).json()["status"] == status
+
+
+# (balance, actions taken first, action under test, error detail, status left in place)
+@pytest.mark.parametrize("balance,setup,action,detail,status", [
+    (0.0, ["freeze"], "freeze", "Account is already frozen", "FROZEN"),
+    (0.0, ["close"], "freeze", "Cannot freeze a closed account", "CLOSED"),
+    (0.0, [], "unfreeze", "Account is not frozen", "ACTIVE"),
+    (0.0, ["close"], "unfreeze", "Account is not frozen", "CLOSED"),
+    (0.0, ["close"], "close", "Account is already closed", "CLOSED"),
+    (
+        10.0, [], "close",
+        "Cannot close account with non-zero balance. Please withdraw or transfer all funds first.", "ACTIVE"
+    ),
+    (
+        10.0, ["freeze"], "close",
+        "Cannot close account with non-zero balance. Please withdraw or transfer all funds first.", "FROZEN"
+    ),
+])
+def test_account_status_guard(authenticated_client, make_accounts, balance, setup, action, detail, status):
+    """Test that a transition its guard rejects returns 400 and leaves the status unchanged."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=balance)
+    for step in setup:
+        assert client.patch(f"/accounts/{account_id}/{step}", headers=headers).status_code == 200
+
+    response = client.patch(f"/accounts/{account_id}/{action}", headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": detail}
+    assert client.get(f"/accounts/{account_id}", headers=headers).json()["status"] == status
+
+
+@pytest.mark.parametrize("action", ["freeze", "unfreeze", "close"])
+def test_account_status_other_users_account(authenticated_client, fresh_authenticated_client, action):
+    """Test that status changes on a missing or another user's account return 404."""
+    client, headers, _ = authenticated_client
+    _, other_headers, _ = fresh_authenticated_client
+    other_account_id = client.post("/accounts", headers=other_headers, json={"type": "CHECKING"}).json()["id"]
+
+    for account_id in (str(uuid.uuid4()), other_account_id):
+        response = client.patch(f"/accounts/{account_id}/{action}", headers=headers)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Account not found"}
+
+    assert client.get(f"/accounts/{other_account_id}", headers=other_headers).json()["status"] == "ACTIVE"
 
-    response = client.patch(f"/accounts/{fake_id}/unfreeze")
 
-    assert response.status_code == 401, \
-        f"Expected 401 for unauthenticated request, got {response.status_code}"
+# ========== UNAUTHENTICATED TESTS ==========
 
+FAKE_ID = "00000000-0000-0000-0000-000000000000"
 
-def test_close_account_unauthenticated(client):
-    """Test that closing an account without auth returns 401."""
-    fake_id = "00000000-0000-0000-0000-000000000000"
 
-    response = client.patch(f"/accounts/{fake_id}/close")
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_create_account_unauthenticated(client, headers, body):
+    """Test that creating an account without (valid) auth returns 401."""
+    response = client.post("/accounts", headers=headers, json={"type": "CHECKING"})
 
     assert response.status_code == 401, \
         f"Expected 401 for unauthenticated request, got {response.status_code}"
+    assert response.json() == body
+
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_get_account_unauthenticated(client, headers, body):
+    """Test that reading an account without (valid) auth returns 401."""
+    response = client.get(f"/accounts/{FAKE_ID}", headers=headers)
+
+    assert response.status_code == 401
+    assert response.json() == body
+
+
+@pytest.mark.parametrize("method,path", [
+    ("POST", "/accounts"),
+    ("GET", "/accounts"),
+    ("GET", "/accounts/{fid}"),
+    ("GET", "/accounts/{fid}/transactions"),
+    ("PATCH", "/accounts/{fid}/freeze"),
+    ("PATCH", "/accounts/{fid}/unfreeze"),
+    ("PATCH", "/accounts/{fid}/close"),
+])
+def test_account_routes_require_auth(route_requires_auth, method, path):
+    """Test that every account route depends on the auth check."""
+    assert route_requires_auth(method, path.format(fid=FAKE_ID))
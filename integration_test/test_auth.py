@@ -1,15 +1,10 @@
 import pytest
-import uuid
+from fastapi import HTTPException
+from starlette.requests import Request
 
+from app.security import get_current_user
+from conftest import UNAUTHENTICATED
 
-@pytest.fixture
-def user_data():
-    """Generates a unique email and password for each test run."""
-    random_id = str(uuid.uuid4())[:8]
-    return {
-        "email": f"test_{random_id}@gmail.com",
-        "password": "password2"
-    }
 
 def test_auth_workflow(client, user_data):
     """
@@ -49,4 +44,67 @@ def test_auth_workflow(client, user_data):
     
     # Verify the data returned matches the user we created
     me_json = me_response.json()
-    assert me_json["email"] == user_data["email"]
\ No newline at end of file
+    assert me_json["email"] == user_data["email"]
+
+
+@pytest.mark.parametrize("token", [None, "", "not-a-jwt"])
+def test_get_current_user_rejects_bad_token(token):
+    """The auth dependency itself raises 401 -> no request through the app needed."""
+    with pytest.raises(HTTPException) as e:
+        get_current_user(Request({"type": "http"}), token=token)
+    assert e.value.status_code == 401
+
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_me_unauthenticated(client, headers, body):
+    """Test that the 'Me' endpoint without (valid) auth returns 401."""
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == body
+
+
+def test_logout_revokes_token(fresh_authenticated_client):
+    """Logging out bumps the user's token version -> the old token is rejected, a new login works."""
+    client, headers, user_data = fresh_authenticated_client
+
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+
+    response = client.get("/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+
+    token = client.post("/auth/login", json=user_data).json()["access_token"]
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+# ========== RATE LIMIT TESTS ==========
+
+def test_login_rate_limited(client, user_data, rate_limited):
+    """Test that the 11th login inside a minute is rejected by the route's 10/minute limit."""
+    # signup has its own 5/minute limit -> one call leaves login's counter untouched
+    assert client.post("/auth/signup", json=user_data).status_code in [200, 201]
+
+    for _ in range(10):
+        assert client.post("/auth/login", json=user_data).status_code == 200
+
+    response = client.post("/auth/login", json=user_data)
+    assert response.status_code == 429
+
+
+def test_invalid_body_counts_toward_limit(client, rate_limited):
+    """Test that requests failing validation still use up the route's limit."""
+    for _ in range(10):
+        assert client.post("/auth/login", json={"email": "not-an-email"}).status_code == 422
+
+    assert client.post("/auth/login", json={"email": "not-an-email"}).status_code == 429
+
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_unauthenticated_requests_count_toward_limit(client, rate_limited, headers, body):
+    """Test that requests rejected by the auth check still use up the route's limit."""
+    for _ in range(10):
+        response = client.post("/auth/logout", headers=headers)
+        assert response.status_code == 401
+        assert response.json() == body
+
+    assert client.post("/auth/logout", headers=headers).status_code == 429
@@ -1,18 +1,20 @@
 import pytest
 import uuid
 
+from conftest import UNAUTHENTICATED
+
 # ========== AUTHENTICATED TESTS ==========
 
-def test_create_card_success(authenticated_client):
+def test_create_card_success(authenticated_client, make_accounts):
     """Test successful card creation for a valid account."""
     client, headers, _ = authenticated_client
 
     # create an account
-    acc = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
+    [account_id] = make_accounts()
 
     # create a card
     card_data = {
-        "account_id": acc["id"],
+        "account_id": account_id,
         "card_type": "DEBIT",
         "card_holder_name": "John Doe",
         "pin": "1234",
@@ -29,92 +31,104 @@ def test_create_card_success(authenticated_client):
     assert len(data["card_number"]) == 16
     assert data["status"] == "ACTIVE"
 
+    # the create response and later reads agree on the expiry (both naive UTC)
+    fetched = client.get(f"/cards/{data['id']}", headers=headers).json()
+    assert fetched["expiry_date"] == data["expiry_date"]
+
 
-def test_create_card_invalid_pin(authenticated_client):
+def test_create_card_invalid_pin(authenticated_client, make_accounts):
     """Test card creation fails with non-4-digit PIN."""
     client, headers, _ = authenticated_client
-    acc = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
+    [account_id] = make_accounts()
 
     # card data with invalid pin
     card_data = {
-        "account_id": acc["id"],
+        "account_id": account_id,
         "card_type": "DEBIT",
         "card_holder_name": "John Doe",
         "pin": "12a",
         "spending_limit": 1000.0
     }
     
+    # CardCreate rejects the pin before the route runs -> FastAPI's 422 validation error
     response = client.post("/cards", headers=headers, json=card_data)
-    assert response.status_code == 400
-    assert "PIN must be exactly 4 digits" in response.json()["detail"]
+    assert response.status_code == 422
+    assert [error["loc"][-1] for error in response.json()["detail"]] == ["pin"]
 
 
-def test_get_cards_list(authenticated_client):
+def test_get_cards_list(authenticated_client, make_accounts, make_card):
     """Test retrieving all cards for the user."""
     client, headers, _ = authenticated_client
     
     # Create an account and a card
-    acc = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
-    client.post("/cards", headers=headers, json={
-        "account_id": acc["id"], "card_type": "DEBIT", 
-        "card_holder_name": "Test User", "pin": "1111"
-    })
+    [account_id] = make_accounts()
+    make_card(account_id)
 
     response = client.get("/cards", headers=headers)
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
-    assert len(response.json()) >= 1
+    cards = response.json()
+    assert isinstance(cards, list)
+    assert len(cards) >= 1
 
 
-def test_freeze_and_unfreeze_card(authenticated_client):
+def test_freeze_and_unfreeze_card(authenticated_client, make_accounts, make_card):
     """Test the card lifecycle: Active -> Frozen -> Active."""
     client, headers, _ = authenticated_client
     
     # Create card
-    acc = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
-    card = client.post("/cards", headers=headers, json={
-        "account_id": acc["id"], "card_type": "DEBIT", 
-        "card_holder_name": "Test User", "pin": "1111"
-    }).json()
+    [account_id] = make_accounts()
+    card_id = make_card(account_id)
 
     # Freeze
-    freeze_res = client.patch(f"/cards/{card['id']}/freeze", headers=headers)
+    freeze_res = client.patch(f"/cards/{card_id}/freeze", headers=headers)
     assert freeze_res.status_code == 200
     assert freeze_res.json()["status"] == "FROZEN"
 
     # Unfreeze
-    unfreeze_res = client.patch(f"/cards/{card['id']}/unfreeze", headers=headers)
+    unfreeze_res = client.patch(f"/cards/{card_id}/unfreeze", headers=headers)
     assert unfreeze_res.status_code == 200
     assert unfreeze_res.json()["status"] == "ACTIVE"
 
 
-def test_cancel_card_permanent(authenticated_client):
+def test_cancel_card_permanent(authenticated_client, make_accounts, make_card):
     """Test that a cancelled card cannot be frozen or unfrozen."""
     client, headers, _ = authenticated_client
     
-    acc = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
-    card = client.post("/cards", headers=headers, json={
-        "account_id": acc["id"], "card_type": "DEBIT", 
-        "card_holder_name": "Test User", "pin": "1111"
-    }).json()
+    [account_id] = make_accounts()
+    card_id = make_card(account_id)
 
     # Cancel
-    client.delete(f"/cards/{card['id']}", headers=headers)
+    client.delete(f"/cards/{card_id}", headers=headers)
     
     # Try to freeze
-    response = client.patch(f"/cards/{card['id']}/freeze", headers=headers)
+    response = client.patch(f"/cards/{card_id}/freeze", headers=headers)
     assert response.status_code == 400
     assert "cancelled" in response.json()["detail"].lower()
 
 
 # ========== UNAUTHENTICATED TESTS ==========
 
-def test_get_cards_unauthenticated(client):
-    response = client.get("/cards")
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_get_cards_unauthenticated(client, headers, body):
+    response = client.get("/cards", headers=headers)
     assert response.status_code == 401
+    assert response.json() == body
 
 
-def test_card_action_unauthenticated(client):
-    fake_id = str(uuid.uuid4())
-    response = client.patch(f"/cards/{fake_id}/freeze")
-    assert response.status_code == 401
\ No newline at end of file
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_card_action_unauthenticated(client, headers, body):
+    response = client.patch(f"/cards/{uuid.uuid4()}/freeze", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == body
+
+
+@pytest.mark.parametrize("method,path", [
+    ("POST", "/cards"),
+    ("GET", "/cards"),
+    ("GET", "/cards/{fid}"),
+    ("PATCH", "/cards/{fid}/freeze"),
+    ("PATCH", "/cards/{fid}/unfreeze"),
+    ("DELETE", "/cards/{fid}"),
+])
+def test_card_routes_require_auth(route_requires_auth, method, path):
+    assert route_requires_auth(method, path.format(fid=uuid.uuid4()))
@@ -0,0 +1,110 @@
+import csv
+import io
+import uuid
+from datetime import datetime
+
+import pytest
+
+from conftest import UNAUTHENTICATED
+
+PERIOD = {"start_date": "2024-02-01T00:00:00", "end_date": "2024-02-28T23:59:59"}
+
+
+@pytest.fixture
+def statement_account(make_accounts, make_transactions):
+    """An account with one credit before the period, three inside it and one debit after it."""
+    [account_id] = make_accounts()
+    make_transactions(account_id, [
+        ("CREDIT", 100.0, datetime(2024, 1, 5)),
+        ("CREDIT", 50.0, datetime(2024, 2, 1, 9)),
+        ("DEBIT", 20.0, datetime(2024, 2, 10)),
+        ("CREDIT", 5.25, datetime(2024, 2, 20)),
+        ("DEBIT", 1.0, datetime(2024, 3, 5)),
+    ])
+    return account_id
+
+
+# ========== AUTHENTICATED TESTS ==========
+
+def test_json_statement_totals(authenticated_client, statement_account):
+    """Test the JSON statement's balances and totals cover only the period's transactions."""
+    client, headers, _ = authenticated_client
+
+    response = client.get(f"/statements/account/{statement_account}", headers=headers, params=PERIOD)
+    assert response.status_code == 200
+
+    statement = response.json()
+    assert statement["opening_balance"] == 100.0
+    assert statement["total_credits"] == 55.25
+    assert statement["total_debits"] == 20.0
+    assert statement["closing_balance"] == 135.25
+    assert statement["transaction_count"] == 3
+    assert [(t["type"], t["debit"], t["credit"]) for t in statement["transactions"]] == [
+        ("CREDIT", 0.0, 50.0),
+        ("DEBIT", 20.0, 0.0),
+        ("CREDIT", 0.0, 5.25),
+    ]
+
+
+def test_json_statement_without_transactions(authenticated_client, statement_account):
+    """Test that include_transactions=false omits the rows but keeps the same totals."""
+    client, headers, _ = authenticated_client
+
+    response = client.get(
+        f"/statements/account/{statement_account}",
+        headers=headers,
+        params={**PERIOD, "include_transactions": "false"}
+    )
+    assert response.status_code == 200
+
+    statement = response.json()
+    assert "transactions" not in statement
+    assert statement["opening_balance"] == 100.0
+    assert statement["total_credits"] == 55.25
+    assert statement["total_debits"] == 20.0
+    assert statement["closing_balance"] == 135.25
+    assert statement["transaction_count"] == 3
+
+
+def test_csv_statement_rows_and_running_balance(authenticated_client, statement_account):
+    """Test the CSV lists the period's rows and its closing line matches the last running balance."""
+    client, headers, _ = authenticated_client
+
+    response = client.get(f"/statements/account/{statement_account}", headers=headers, params={**PERIOD, "format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    lines = list(csv.reader(io.StringIO(response.text)))
+    assert ["Opening Balance", "100.00"] in lines
+
+    header = lines.index(["Date", "Description", "Reference", "Category", "Debit", "Credit", "Balance"])
+    rows = lines[header + 1:lines.index([], header)]
+    assert [(row[4], row[5], row[6]) for row in rows] == [
+        ("", "50.00", "150.00"),
+        ("20.00", "", "130.00"),
+        ("", "5.25", "135.25"),
+    ]
+
+    assert ["Closing Balance", "", "", "", "", "", "135.25"] in lines
+    assert ["Total Debits", "", "", "", "20.00", "", ""] in lines
+    assert ["Total Credits", "", "", "", "", "55.25", ""] in lines
+
+
+def test_pdf_statement(authenticated_client, statement_account):
+    """Test the PDF statement renders to a complete PDF document."""
+    client, headers, _ = authenticated_client
+
+    response = client.get(f"/statements/account/{statement_account}", headers=headers, params={**PERIOD, "format": "pdf"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+
+
+# ========== UNAUTHENTICATED TESTS ==========
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_get_statement_unauthenticated(client, headers, body):
+    """Test that fetching an account statement without (valid) auth returns 401."""
+    response = client.get(f"/statements/account/{uuid.uuid4()}", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == body
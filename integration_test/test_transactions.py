@@ -0,0 +1,203 @@
+import base64
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import UNAUTHENTICATED
+
+
+# ========== AUTHENTICATED TESTS ==========
+
+def _balance(client, headers, account_id):
+    return client.get(f"/accounts/{account_id}", headers=headers).json()["balance"]
+
+
+def _history(client, headers, account_id):
+    return client.get(f"/accounts/{account_id}/transactions", headers=headers).json()
+
+
+def test_withdrawal(authenticated_client, make_accounts):
+    """Test that a covered withdrawal debits the account and records the row."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=50.0)
+
+    response = client.post("/transactions/withdrawal", headers=headers, json={"account_id": account_id, "amount": 20.5})
+    assert response.status_code == 201
+    assert response.json()["type"] == "DEBIT"
+    assert _balance(client, headers, account_id) == 29.5
+    assert len(_history(client, headers, account_id)) == 1
+
+
+def test_withdrawal_insufficient_funds(authenticated_client, make_accounts):
+    """Test that withdrawing more than the balance returns 400 with the available balance."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=10.0)
+
+    response = client.post("/transactions/withdrawal", headers=headers, json={"account_id": account_id, "amount": 10.01})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Insufficient funds. Available balance: 10.00"}
+    assert _balance(client, headers, account_id) == 10.0
+    assert _history(client, headers, account_id) == []
+
+
+def test_withdrawal_frozen_account(authenticated_client, make_accounts):
+    """Test that a frozen account can't be withdrawn from, even with funds."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=10.0)
+    assert client.patch(f"/accounts/{account_id}/freeze", headers=headers).status_code == 200
+
+    response = client.post("/transactions/withdrawal", headers=headers, json={"account_id": account_id, "amount": 1.0})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Account is not active"}
+    assert _balance(client, headers, account_id) == 10.0
+    assert _history(client, headers, account_id) == []
+
+
+def test_withdrawal_missing_account(authenticated_client):
+    """Test that withdrawing from an account that doesn't exist returns 404."""
+    client, headers, _ = authenticated_client
+
+    response = client.post("/transactions/withdrawal", headers=headers, json={"account_id": str(uuid.uuid4()), "amount": 1.0})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Account not found"}
+
+
+def test_withdrawal_other_users_account(authenticated_client, fresh_authenticated_client):
+    """Test that another user's account is refused and left untouched."""
+    client, headers, _ = authenticated_client
+    _, other_headers, _ = fresh_authenticated_client
+    account_id = client.post("/accounts", headers=other_headers, json={"type": "CHECKING"}).json()["id"]
+    assert client.post("/transactions/deposit", headers=other_headers, json={"account_id": account_id, "amount": 10.0}).status_code == 201
+
+    response = client.post("/transactions/withdrawal", headers=headers, json={"account_id": account_id, "amount": 1.0})
+    assert response.status_code == 403
+    assert response.json() == {"detail": "You do not have permission to withdraw from this account"}
+    assert _balance(client, other_headers, account_id) == 10.0
+    assert len(_history(client, other_headers, account_id)) == 1
+
+
+def test_card_payment(authenticated_client, make_accounts, make_card):
+    """Test that a card payment debits the card's account and records the row against the card."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=50.0)
+    card_id = make_card(account_id)
+
+    response = client.post("/transactions/card-payment", headers=headers, json={"card_id": card_id, "amount": 12.5})
+    assert response.status_code == 201
+    assert response.json()["card_id"] == card_id
+    assert _balance(client, headers, account_id) == 37.5
+    assert len(_history(client, headers, account_id)) == 1
+
+
+@pytest.mark.parametrize("balance,spending_limit,freeze,amount,detail", [
+    (50.0, None, True, 1.0, "Card is frozen. Please unfreeze to make payments."),
+    (50.0, 20.0, False, 20.01, "Payment exceeds card spending limit of 20.00"),
+    (10.0, None, False, 10.01, "Insufficient funds. Available balance: 10.00"),
+])
+def test_card_payment_rejected(
+    authenticated_client, make_accounts, make_card, balance, spending_limit, freeze, amount, detail
+):
+    """Test that a rejected card payment returns 400 and writes neither the balance nor a transaction."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts(balance=balance)
+    card_id = make_card(account_id, spending_limit=spending_limit)
+    if freeze:
+        assert client.patch(f"/cards/{card_id}/freeze", headers=headers).status_code == 200
+
+    response = client.post("/transactions/card-payment", headers=headers, json={"card_id": card_id, "amount": amount})
+    assert response.status_code == 400
+    assert response.json() == {"detail": detail}
+    assert _balance(client, headers, account_id) == balance
+    assert _history(client, headers, account_id) == []
+
+
+def test_cursor_pages_cover_every_transaction_once(authenticated_client, make_accounts, make_transactions):
+    """Test that following X-Next-Cursor walks the history newest first with no gaps or duplicates."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts()
+
+    start = datetime(2024, 1, 1)
+    # two rows share a timestamp -> only the id tie-break keeps them apart across a page boundary
+    times = [start + timedelta(hours=h) for h in (0, 1, 2, 2, 3, 4, 5)]
+    ids = make_transactions(account_id, [("CREDIT", 1.0, t) for t in times])
+
+    seen = []
+    pages = []
+    params = {"account_id": account_id, "limit": 3}
+    while True:
+        response = client.get("/transactions", headers=headers, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(len(page))
+        seen += [t["id"] for t in page]
+
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+
+    assert pages == [3, 3, 1]
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+
+    created = [t["created_at"] for t in client.get(
+        "/transactions", headers=headers, params={"account_id": account_id}
+    ).json()]
+    assert created == sorted(created, reverse=True)
+
+
+def test_short_page_has_no_next_cursor(authenticated_client, make_accounts, make_transactions):
+    """Test that a page with fewer rows than the limit doesn't set X-Next-Cursor."""
+    client, headers, _ = authenticated_client
+    [account_id] = make_accounts()
+    make_transactions(account_id, [("CREDIT", 1.0, datetime(2024, 1, 1)), ("CREDIT", 2.0, datetime(2024, 1, 2))])
+
+    response = client.get("/transactions", headers=headers, params={"account_id": account_id, "limit": 3})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    base64.urlsafe_b64encode(b"yesterday|not-a-uuid").decode(),
+    base64.urlsafe_b64encode(b"no separator").decode(),
+])
+def test_malformed_cursor(authenticated_client, cursor):
+    """Test that a cursor not produced by the API returns 400."""
+    client, headers, _ = authenticated_client
+
+    response = client.get("/transactions", headers=headers, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+# ========== UNAUTHENTICATED TESTS ==========
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_deposit_unauthenticated(client, headers, body):
+    """Test that depositing without (valid) auth returns 401."""
+    deposit_data = {"account_id": str(uuid.uuid4()), "amount": 10.0}
+    response = client.post("/transactions/deposit", headers=headers, json=deposit_data)
+    assert response.status_code == 401
+    assert response.json() == body
+
+
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_get_transactions_unauthenticated(client, headers, body):
+    """Test that listing transactions without (valid) auth returns 401."""
+    response = client.get("/transactions", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == body
+
+
+@pytest.mark.parametrize("method,path", [
+    ("POST", "/transactions/deposit"),
+    ("POST", "/transactions/withdrawal"),
+    ("POST", "/transactions/card-payment"),
+    ("GET", "/transactions"),
+])
+def test_transaction_routes_require_auth(route_requires_auth, method, path):
+    """Test that every transaction route depends on the auth check."""
+    assert route_requires_auth(method, path)
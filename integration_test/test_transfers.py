@@ -1,19 +1,21 @@
 import pytest
 import uuid
 
+from conftest import UNAUTHENTICATED
+
 # ========== AUTHENTICATED TESTS ==========
 
-def test_create_transfer_success(authenticated_client):
+def test_create_transfer_success(authenticated_client, make_accounts):
     """Test successful transfer between two valid accounts."""
     client, headers, user_data = authenticated_client
 
     # Create source and destination accounts
-    acc1 = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
-    acc2 = client.post("/accounts", headers=headers, json={"type": "SAVINGS"}).json()
+    [acc1_id] = make_accounts(type="CHECKING")
+    [acc2_id] = make_accounts(type="SAVINGS")
 
     # Deposit money into source account
     deposit_data = {
-        "account_id": acc1["id"],
+        "account_id": acc1_id,
         "amount": 100.0,
         "description": "Initial deposit"
     }
@@ -22,8 +24,8 @@ def test_create_transfer_success(authenticated_client):
 
     # Transfer money from acc1 to acc2
     transfer_data = {
-        "source_account_id": acc1["id"],
-        "destination_account_id": acc2["id"],
+        "source_account_id": acc1_id,
+        "destination_account_id": acc2_id,
         "amount": 50.0,
         "description": "Rent payment"
     }
@@ -32,24 +34,23 @@ def test_create_transfer_success(authenticated_client):
     assert response.status_code == 201
 
     # Validate balances after transfer
-    acc1_after = client.get(f"/accounts/{acc1['id']}", headers=headers).json()
-    acc2_after = client.get(f"/accounts/{acc2['id']}", headers=headers).json()
+    acc1_after = client.get(f"/accounts/{acc1_id}", headers=headers).json()
+    acc2_after = client.get(f"/accounts/{acc2_id}", headers=headers).json()
 
     assert acc1_after["balance"] == 50.0
     assert acc2_after["balance"] == 50.0 
 
 
-def test_transfer_insufficient_funds(authenticated_client):
+def test_transfer_insufficient_funds(authenticated_client, make_accounts):
     """Test transfer fails when balance is too low."""
     client, headers, _ = authenticated_client
 
-    acc1 = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
-    acc2 = client.post("/accounts", headers=headers, json={"type": "SAVINGS"}).json()
+    acc1_id, acc2_id = make_accounts(2)
 
     # attempt to transfer more than balance
     transfer_data = {
-        "source_account_id": acc1["id"],
-        "destination_account_id": acc2["id"],
+        "source_account_id": acc1_id,
+        "destination_account_id": acc2_id,
         "amount": 999999.0,
         "description": "Too expensive"
     }
@@ -59,20 +60,40 @@ def test_transfer_insufficient_funds(authenticated_client):
     assert "Insufficient funds" in response.json()["detail"]
 
 
-def test_transfer_to_same_account(authenticated_client):
+def test_failed_transfer_leaves_balances_unchanged(authenticated_client, make_accounts):
+    """Test that a rejected transfer rolls back the destination credit of the guarded update."""
+    client, headers, _ = authenticated_client
+
+    acc1_id, acc2_id = make_accounts(2)
+
+    transfer_data = {
+        "source_account_id": acc1_id,
+        "destination_account_id": acc2_id,
+        "amount": 5.0
+    }
+
+    response = client.post("/transfers", headers=headers, json=transfer_data)
+    assert response.status_code == 400
+
+    destination = client.get(f"/accounts/{acc2_id}", headers=headers).json()
+    assert destination["balance"] == 0.0
+
+
+def test_transfer_to_same_account(authenticated_client, make_accounts):
     """Test that source and destination cannot be the same."""
     client, headers, _ = authenticated_client
-    acc1 = client.post("/accounts", headers=headers, json={"type": "CHECKING"}).json()
+    [acc1_id] = make_accounts()
 
     transfer_data = {
-        "source_account_id": acc1["id"],
-        "destination_account_id": acc1["id"],
+        "source_account_id": acc1_id,
+        "destination_account_id": acc1_id,
         "amount": 10.0
     }
 
+    # TransferCreate rejects it before the route runs -> FastAPI's 422 validation error
     response = client.post("/transfers", headers=headers, json=transfer_data)
-    assert response.status_code == 400
-    assert "must be different" in response.json()["detail"]
+    assert response.status_code == 422
+    assert "must be different" in response.json()["detail"][0]["msg"]
 
 
 def test_get_transfers_list(authenticated_client):
@@ -84,27 +105,70 @@ def test_get_transfers_list(authenticated_client):
     assert isinstance(response.json(), list)
 
 
+def test_get_transfers_lists_each_transfer_once(authenticated_client, fresh_authenticated_client, make_accounts):
+    """Test that sent, received and own-account transfers each appear exactly once, newest first."""
+    client, headers, _ = authenticated_client
+    _, other_headers, _ = fresh_authenticated_client
+
+    [checking_id] = make_accounts(type="CHECKING", balance=100.0)
+    [savings_id] = make_accounts(type="SAVINGS")
+    other_id = client.post("/accounts", headers=other_headers, json={"type": "CHECKING"}).json()["id"]
+    assert client.post("/transactions/deposit", headers=other_headers, json={"account_id": other_id, "amount": 100.0}).status_code == 201
+
+    def transfer(headers, source_id, destination_id):
+        response = client.post("/transfers", headers=headers, json={
+            "source_account_id": source_id,
+            "destination_account_id": destination_id,
+            "amount": 10.0
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    own = transfer(headers, checking_id, savings_id)
+    sent = transfer(headers, checking_id, other_id)
+    received = transfer(other_headers, other_id, savings_id)
+
+    response = client.get("/transfers", headers=headers)
+    assert response.status_code == 200
+    transfers = response.json()
+    assert sorted(t["id"] for t in transfers) == sorted([own, sent, received])
+
+    keys = [(t["created_at"], t["id"]) for t in transfers]
+    assert keys == sorted(keys, reverse=True)
+
+    # the other user only took part in two of them
+    other_transfers = client.get("/transfers", headers=other_headers).json()
+    assert sorted(t["id"] for t in other_transfers) == sorted([sent, received])
+
+
 # ========== UNAUTHENTICATED TESTS ==========
 
-def test_create_transfer_unauthenticated(client):
-    """Test that creating a transfer without auth returns 401."""
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_create_transfer_unauthenticated(client, headers, body):
+    """Test that creating a transfer without (valid) auth returns 401."""
     transfer_data = {
         "source_account_id": str(uuid.uuid4()),
         "destination_account_id": str(uuid.uuid4()),
         "amount": 100.0
     }
-    response = client.post("/transfers", json=transfer_data)
+    response = client.post("/transfers", headers=headers, json=transfer_data)
     assert response.status_code == 401
+    assert response.json() == body
 
 
-def test_get_transfers_unauthenticated(client):
-    """Test that fetching transfers without auth returns 401."""
-    response = client.get("/transfers")
+@pytest.mark.parametrize("headers,body", UNAUTHENTICATED)
+def test_get_transfers_unauthenticated(client, headers, body):
+    """Test that fetching transfers without (valid) auth returns 401."""
+    response = client.get("/transfers", headers=headers)
     assert response.status_code == 401
+    assert response.json() == body
 
 
-def test_get_specific_transfer_unauthenticated(client):
-    """Test that fetching a specific transfer without auth returns 401."""
-    fake_id = str(uuid.uuid4())
-    response = client.get(f"/transfers/{fake_id}")
-    assert response.status_code == 401
+@pytest.mark.parametrize("method,path", [
+    ("POST", "/transfers"),
+    ("GET", "/transfers"),
+    ("GET", "/transfers/{fid}"),
+])
+def test_transfer_routes_require_auth(route_requires_auth, method, path):
+    """Test that creating or fetching transfers depends on the auth check."""
+    assert route_requires_auth(method, path.format(fid=uuid.uuid4()))
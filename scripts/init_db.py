@@ -0,0 +1,29 @@
+"""
+One-shot schema bootstrap. Run once per database, not on every worker boot:
+
+    python -m scripts.init_db
+"""
+
+from app.database import Base, engine
+from app import models  # noqa: F401 -- registers the tables on Base.metadata
+
+
+# replaced by a wider index of the same prefix -> dropped so writes don't maintain both
+SUPERSEDED_INDEXES = ("ix_tx_account_created", "ix_accounts_user_id")
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist -> add indexes introduced since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+if __name__ == "__main__":
+    init_db()
+    print(f"Created tables: {', '.join(Base.metadata.tables)}")
@@ -0,0 +1,40 @@
+"""
+One-shot migration of the Numeric(10,2) money columns to integer cents:
+
+    python -m scripts.migrate_money_to_cents
+
+Safe to re-run: columns that were already renamed are skipped.
+"""
+
+from app.database import engine
+
+
+# table -> (old column, new column)
+MONEY_COLUMNS = {
+    "accounts": ("balance", "balance_cents"),
+    "transactions": ("amount", "amount_cents"),
+    "transfers": ("amount", "amount_cents"),
+    "cards": ("spending_limit", "spending_limit_cents"),
+}
+
+
+def migrate():
+    migrated = []
+    with engine.begin() as conn:
+        for table, (old, new) in MONEY_COLUMNS.items():
+            columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if old not in columns:
+                continue
+
+            conn.exec_driver_sql(f"ALTER TABLE {table} RENAME COLUMN {old} TO {new}")
+            # NULL spending limits stay NULL
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET {new} = CAST(ROUND({new} * 100) AS INTEGER)"
+            )
+            migrated.append(f"{table}.{new}")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrated = migrate()
+    print(f"Migrated: {', '.join(migrated) or 'nothing to do'}")
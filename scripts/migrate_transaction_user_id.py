@@ -0,0 +1,29 @@
+"""
+One-shot migration adding the denormalized transactions.user_id column:
+
+    python -m scripts.migrate_transaction_user_id
+
+Run before scripts.init_db on an existing database (init_db indexes the column).
+Safe to re-run: skipped once the column exists, or when there is no table yet.
+"""
+
+from app.database import engine
+
+
+def migrate():
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(transactions)")}
+        if not columns or "user_id" in columns:
+            return False
+
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN user_id BLOB")
+        # accounts never change owner -> the account's owner is the transaction's owner for good
+        conn.exec_driver_sql(
+            "UPDATE transactions SET user_id = "
+            "(SELECT accounts.user_id FROM accounts WHERE accounts.id = transactions.account_id)"
+        )
+    return True
+
+
+if __name__ == "__main__":
+    print("Migrated: transactions.user_id" if migrate() else "Migrated: nothing to do")
@@ -0,0 +1,24 @@
+"""
+One-shot migration adding users.token_version (embedded in access tokens as "ver"):
+
+    python -m scripts.migrate_user_token_version
+
+Existing users start at version 0, which matches tokens issued before the column existed.
+Safe to re-run: skipped once the column exists, or when there is no table yet.
+"""
+
+from app.database import engine
+
+
+def migrate():
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(users)")}
+        if not columns or "token_version" in columns:
+            return False
+
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+    return True
+
+
+if __name__ == "__main__":
+    print("Migrated: users.token_version" if migrate() else "Migrated: nothing to do")
@@ -0,0 +1,40 @@
+"""
+One-shot migration of UUID columns from hex text to 16-byte blobs:
+
+    python -m scripts.migrate_uuid_to_binary
+
+Safe to re-run: only values still stored as text are converted.
+"""
+
+import uuid
+
+from app.database import Base, engine
+from app.models import GUID
+
+
+def _uuid_blob(value):
+    return uuid.UUID(value).bytes
+
+
+def migrate():
+    migrated = []
+    with engine.begin() as conn:
+        conn.connection.dbapi_connection.create_function("uuid_blob", 1, _uuid_blob, deterministic=True)
+        # primary and foreign keys change together -> check FKs once, at commit
+        conn.exec_driver_sql("PRAGMA defer_foreign_keys=ON")
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                if not isinstance(column.type, GUID):
+                    continue
+                result = conn.exec_driver_sql(
+                    f"UPDATE {table.name} SET {column.name} = uuid_blob({column.name}) "
+                    f"WHERE typeof({column.name}) = 'text'"
+                )
+                if result.rowcount:
+                    migrated.append(f"{table.name}.{column.name}")
+    return migrated
+
+
+if __name__ == "__main__":
+    migrated = migrate()
+    print(f"Migrated: {', '.join(migrated) or 'nothing to do'}")